@@ -39,7 +39,7 @@ from sqlalchemy import select, func, delete
 
 from auth import require_auth, get_current_user
 from chat_engine import ChatEngine, ExtractedContext
-from logging_config import setup_logging
+from logging_config import setup_logging, shutdown_logging
 from pipeline_engine import process_companies as _process_companies_core, run_discovery
 from stripe_billing import is_stripe_configured
 from contact_extraction import extract_contacts_from_content
@@ -350,7 +350,10 @@ async def lifespan(app: FastAPI):
         scheduler_task.cancel()
     if requalification_task:
         requalification_task.cancel()
+    from scraper import close_global_pool
+    await close_global_pool()
     logger.info("Shutting down")
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -11,6 +11,7 @@ Tables:
   - qualified_leads:    Qualified companies with scores and reasoning
   - enrichment_results: Contact info found via Hunter/Apollo
   - usage_tracking:     Per-user monthly lead usage for billing limits
+  - scheduler_state:    Key/value flags shared by all scheduler workers
 """
 
 from datetime import datetime, timezone
@@ -362,5 +363,19 @@ class PipelineSchedule(Base):
     profile: Mapped["Profile"] = relationship(back_populates="schedules")
 
     __table_args__ = (
-        Index("ix_schedules_next_run_active", "next_run_at", postgresql_where=text("is_active = TRUE AND is_running = FALSE")),
+        Index(
+            "ix_schedules_next_run_active",
+            "next_run_at",
+            postgresql_include=["id", "user_id", "name", "frequency"],
+            postgresql_where=text("is_active = TRUE AND is_running = FALSE"),
+        ),
     )
+
+
+class SchedulerState(Base):
+    """Cluster-wide scheduler bookkeeping (e.g. last daily re-qualification date)."""
+    __tablename__ = "scheduler_state"
+
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[str] = mapped_column(Text)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, onupdate=_utcnow)
@@ -1,11 +1,40 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+from typing import Optional
+
+# Background thread that drains the log queue into the real handlers, so
+# event-loop code (scheduler ticks, per-lead logs) never blocks on stderr/file I/O.
+_listener: Optional[logging.handlers.QueueListener] = None
 
 
 def setup_logging():
+    global _listener
     level = os.getenv("LOG_LEVEL", "INFO").upper()
     logging.basicConfig(
         level=getattr(logging, level, logging.INFO),
         format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, *root.handlers, respect_handler_level=True
+    )
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records, stop the listener and restore direct handlers. Idempotent."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().handlers = list(_listener.handlers)
+        _listener = None
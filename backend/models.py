@@ -72,6 +72,7 @@ class CrawlResult(BaseModel):
     """Result from web crawler"""
     url: str
     success: bool
+    final_url: Optional[str] = None          # After redirects (None if unknown)
     markdown_content: Optional[str] = None
     screenshot_base64: Optional[str] = None
     title: Optional[str] = None
@@ -53,10 +53,13 @@ MIGRATION_STATEMENTS = [
     );
     """,
 
-    # 4. Create index on pipeline_schedules for scheduler polling
+    # 4. Create covering index on pipeline_schedules for scheduler polling
+    #    (INCLUDE needs PG 11+; drop first so older non-covering copies get upgraded)
     """
-    CREATE INDEX IF NOT EXISTS ix_schedules_next_run_active
+    DROP INDEX IF EXISTS ix_schedules_next_run_active;
+    CREATE INDEX ix_schedules_next_run_active
     ON pipeline_schedules (next_run_at)
+    INCLUDE (id, user_id, name, frequency)
     WHERE is_active = TRUE AND is_running = FALSE;
     """,
 
@@ -77,6 +80,15 @@ MIGRATION_STATEMENTS = [
     CREATE INDEX IF NOT EXISTS ix_lead_snapshots_lead_scored
     ON lead_snapshots (lead_id, scored_at DESC);
     """,
+
+    # 7. Create scheduler_state table (cluster-wide daily re-qual guard)
+    """
+    CREATE TABLE IF NOT EXISTS scheduler_state (
+        key VARCHAR(100) PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at TIMESTAMPTZ DEFAULT now()
+    );
+    """,
 ]
 
 
@@ -20,17 +20,21 @@ Design choices vs. TIER2_PLAN.md:
   - ``next_run_at`` is only advanced on success or explicit skip — not
     before dispatch — so a crash mid-run doesn't lose a cycle.
   - Daily re-qual uses an hourly check + ``last_requalification_date`` in
-    the DB to avoid drift from ``asyncio.sleep(86400)``.
+    ``scheduler_state`` to avoid drift from ``asyncio.sleep(86400)``; the
+    atomic upsert makes it fire once per day cluster-wide.
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import select, update
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from db import async_session
 from db.models import (
@@ -39,6 +43,7 @@ from db.models import (
     QualifiedLead,
     LeadSnapshot,
     EnrichmentJob,
+    SchedulerState,
     Search,
 )
 
@@ -57,6 +62,9 @@ FREQUENCY_DELTAS: dict[str, timedelta] = {
 
 VALID_FREQUENCIES = set(FREQUENCY_DELTAS.keys())
 
+# Fallback for unknown frequencies — built once instead of per call
+_DEFAULT_DELTA = FREQUENCY_DELTAS["weekly"]
+
 # Auto-pause after this many consecutive failures
 MAX_CONSECUTIVE_FAILURES = 3
 
@@ -65,55 +73,106 @@ MAX_CONSECUTIVE_FAILURES = 3
 # Helpers
 # ──────────────────────────────────────────────
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 def compute_next_run(frequency: str, from_dt: Optional[datetime] = None) -> datetime:
     """Compute the next run time from *from_dt* (default: now UTC)."""
-    base = from_dt or datetime.now(timezone.utc)
-    delta = FREQUENCY_DELTAS.get(frequency, timedelta(weeks=1))
-    return base + delta
+    base = from_dt or _utcnow()
+    return base + FREQUENCY_DELTAS.get(frequency, _DEFAULT_DELTA)
+
+
+@dataclass(slots=True)
+class ScheduleConfig:
+    """Typed view of ``PipelineSchedule.pipeline_config``."""
+    search_ctx: dict = field(default_factory=dict)
+    mode: str = "discover"
+    max_leads: int = 100
+    use_vision: bool = True
+    country_code: Optional[str] = None
+    domains: list[str] = field(default_factory=list)
+
+
+def parse_schedule_config(raw: Optional[dict]) -> ScheduleConfig:
+    """Unpack a saved pipeline config in one pass, applying defaults."""
+    raw = raw or {}
+    opts = raw.get("options") or {}
+    return ScheduleConfig(
+        search_ctx=raw.get("search_context") or {},
+        mode=raw.get("mode", "discover"),
+        max_leads=opts.get("max_leads", 100),
+        use_vision=opts.get("use_vision", True),
+        country_code=raw.get("country_code"),
+        domains=raw.get("domains") or [],
+    )
 
 
 # ──────────────────────────────────────────────
 # 1. Scheduled Pipeline Loop
 # ──────────────────────────────────────────────
 
+async def _claim_due_schedules(db, now: datetime) -> list:
+    """
+    Atomically flip ``is_running`` on up to 10 due schedules and return them.
+
+    A single ``UPDATE ... RETURNING`` both selects and claims the rows, so
+    two workers polling at the same instant can never dispatch the same
+    schedule, and the caller never holds ORM objects past the commit.
+    """
+    due_ids = (
+        select(PipelineSchedule.id)
+        .where(
+            PipelineSchedule.is_active.is_(True),
+            PipelineSchedule.is_running.is_(False),
+            PipelineSchedule.next_run_at <= now,
+        )
+        # Oldest first; satisfied by ix_schedules_next_run_active as an index-only scan
+        .order_by(PipelineSchedule.next_run_at)
+        .limit(10)  # Process max 10 per tick to avoid overload
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(PipelineSchedule)
+        .where(
+            PipelineSchedule.id.in_(due_ids.scalar_subquery()),
+            PipelineSchedule.is_running.is_(False),
+        )
+        .values(is_running=True)
+        .returning(PipelineSchedule.id, PipelineSchedule.name, PipelineSchedule.frequency)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.all()
+    await db.commit()
+    return claimed
+
+
 async def schedule_loop() -> None:
     """
     Main scheduler loop — runs every 60s, checks for due schedules.
 
     For each due schedule (``next_run_at <= now`` AND ``is_active`` AND
     NOT ``is_running``):
-      1. Set ``is_running = True`` (claim the lock).
-      2. Dispatch ``run_scheduled_pipeline`` as a background task.
+      1. Set ``is_running = True`` (claim the lock) in one atomic statement.
+      2. Release the DB connection.
+      3. Dispatch ``run_scheduled_pipeline`` as a background task.
     """
     logger.info("Scheduler loop started")
     while True:
         try:
-            now = datetime.now(timezone.utc)
+            now = _utcnow()
             async with async_session() as db:
-                result = await db.execute(
-                    select(PipelineSchedule)
-                    .where(
-                        PipelineSchedule.is_active.is_(True),
-                        PipelineSchedule.is_running.is_(False),
-                        PipelineSchedule.next_run_at <= now,
-                    )
-                    .limit(10)  # Process max 10 per tick to avoid overload
+                claimed = await _claim_due_schedules(db, now)
+
+            # Session is closed here — dispatched runs get a free pool slot
+            for row in claimed:
+                logger.info(
+                    "Dispatching scheduled pipeline: %s (id=%s, freq=%s)",
+                    row.name,
+                    row.id,
+                    row.frequency,
                 )
-                due_schedules = result.scalars().all()
-
-                for schedule in due_schedules:
-                    # Claim the lock
-                    schedule.is_running = True
-                    await db.commit()
-                    logger.info(
-                        "Dispatching scheduled pipeline: %s (id=%s, freq=%s)",
-                        schedule.name,
-                        schedule.id,
-                        schedule.frequency,
-                    )
-                    asyncio.create_task(
-                        _run_scheduled_pipeline_safe(schedule.id)
-                    )
+                asyncio.create_task(_run_scheduled_pipeline_safe(row.id))
         except Exception as e:
             logger.error("Scheduler loop error: %s", e, exc_info=True)
 
@@ -174,22 +233,23 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
     from sqlalchemy import func as sa_func
 
     async with async_session() as db:
-        schedule = (
+        # Schedule + owner profile in one round trip
+        row = (
             await db.execute(
-                select(PipelineSchedule).where(PipelineSchedule.id == schedule_id)
+                select(PipelineSchedule, Profile)
+                .outerjoin(Profile, Profile.id == PipelineSchedule.user_id)
+                .where(PipelineSchedule.id == schedule_id)
             )
-        ).scalar_one_or_none()
+        ).one_or_none()
 
-        if not schedule:
+        if not row:
             logger.warning("Schedule %s not found — skipping", schedule_id)
             return
 
+        schedule, profile = row
         user_id = schedule.user_id
 
         # ── 1. Check user quota ──
-        profile = (
-            await db.execute(select(Profile).where(Profile.id == user_id))
-        ).scalar_one_or_none()
         plan = profile.plan if profile else "free"
 
         exceeded = await check_quota(db, user_id, plan_tier=plan, action="search")
@@ -202,19 +262,14 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
             return
 
         # ── 2. Build pipeline from saved config ──
-        config = schedule.pipeline_config or {}
-        search_ctx = config.get("search_context", {})
-        mode = config.get("mode", "discover")
-        max_leads = (config.get("options") or {}).get("max_leads", 100)
-        use_vision = (config.get("options") or {}).get("use_vision", True)
-
-        plan_max_leads = LEADS_PER_HUNT.get(plan, 25)
-        max_leads = min(max_leads, plan_max_leads)
+        cfg = parse_schedule_config(schedule.pipeline_config)
+        search_ctx = cfg.search_ctx
+        mode = cfg.mode
+        max_leads = min(cfg.max_leads, LEADS_PER_HUNT.get(plan, 25))
 
         # Save search record
         pipeline_name = f"[Scheduled] {schedule.name}"
-        ctx_for_db = {
-            **(search_ctx or {}),
+        ctx_for_db = search_ctx | {
             "_pipeline_name": pipeline_name,
             "_mode": mode,
             "_schedule_id": schedule.id,
@@ -251,10 +306,7 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
 
                 discovered = await run_discovery(
                     engine=chat_engine,
-                    search_context={
-                        **(search_ctx or {}),
-                        "country_code": config.get("country_code"),
-                    },
+                    search_context=search_ctx | {"country_code": cfg.country_code},
                     run=run,
                 )
 
@@ -265,10 +317,11 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
                         "search_id": search_id,
                     })
                     # Success (no results isn't a failure)
+                    now = _utcnow()
                     schedule.is_running = False
-                    schedule.last_run_at = datetime.now(timezone.utc)
+                    schedule.last_run_at = now
                     schedule.last_run_id = search_id
-                    schedule.next_run_at = compute_next_run(schedule.frequency)
+                    schedule.next_run_at = compute_next_run(schedule.frequency, from_dt=now)
                     schedule.run_count += 1
                     schedule.consecutive_failures = 0
                     schedule.last_error = None
@@ -291,16 +344,15 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
                 await increment_usage(db, user_id, leads_qualified=len(companies))
             else:
                 # qualify_only from saved domains
-                domains = config.get("domains", [])
                 companies = [
                     {"url": f"https://{d}", "domain": d, "title": d.split(".")[0].replace("-", " ").title()}
-                    for d in domains[:max_leads]
+                    for d in cfg.domains[:max_leads]
                 ]
 
             stats = await process_companies(
                 companies=companies,
                 search_ctx=search_ctx,
-                use_vision=use_vision,
+                use_vision=cfg.use_vision,
                 run=run,
                 search_id=search_id,
                 user_id=user_id,
@@ -323,10 +375,11 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
             return
 
         # ── 4. Success — update schedule ──
+        now = _utcnow()
         schedule.is_running = False
-        schedule.last_run_at = datetime.now(timezone.utc)
+        schedule.last_run_at = now
         schedule.last_run_id = search_id
-        schedule.next_run_at = compute_next_run(schedule.frequency)
+        schedule.next_run_at = compute_next_run(schedule.frequency, from_dt=now)
         schedule.run_count += 1
         schedule.consecutive_failures = 0
         schedule.last_error = None
@@ -360,34 +413,120 @@ async def run_scheduled_pipeline(schedule_id: str) -> None:
 # 2. Re-qualification Loop
 # ──────────────────────────────────────────────
 
-# Simple in-memory tracker — survives within a process lifetime.
-# On restart, re-qual fires once then waits 24h. Acceptable.
-_last_requalification_date: Optional[str] = None
+# ``scheduler_state`` key holding the last UTC date re-qualification ran
+_REQUAL_STATE_KEY = "last_requalification_date"
+
+
+async def _claim_daily_run(db, key: str, today: str) -> bool:
+    """
+    Atomically record *today* under *key* if it is newer than the stored date.
+
+    Returns True for exactly one caller per day across all workers — the
+    upsert only rewrites the row (and returns it) when the stored value is
+    older than *today*.
+    """
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(SchedulerState).values(key=key, value=today, updated_at=_utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SchedulerState.key],
+        set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+        where=SchedulerState.value < stmt.excluded.value,
+    ).returning(SchedulerState.value)
+    claimed = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return claimed is not None
+
+
+async def _release_daily_run(db, key: str, today: str, previous: Optional[str]) -> None:
+    """
+    Undo a claim of *today* under *key*, restoring *previous* (or removing the
+    row if there was none), so the next hourly tick retries the day.
+
+    Only touches the row while it still holds *today*.
+    """
+    match = (SchedulerState.key == key) & (SchedulerState.value == today)
+    if previous is None:
+        stmt = delete(SchedulerState).where(match)
+    else:
+        stmt = update(SchedulerState).where(match).values(value=previous, updated_at=_utcnow())
+    await db.execute(stmt.execution_options(synchronize_session=False))
+    await db.commit()
+
+
+async def _requalify_if_due(today: str) -> bool:
+    """
+    Claim *today* and run the daily re-qualification. Returns False if another
+    tick or worker already claimed it.
+
+    A failed run hands the day back before re-raising — the claim is taken up
+    front so only one worker runs, but must not outlive a run that didn't finish.
+    """
+    async with async_session() as db:
+        previous = (await db.execute(
+            select(SchedulerState.value).where(SchedulerState.key == _REQUAL_STATE_KEY)
+        )).scalar_one_or_none()
+        if not await _claim_daily_run(db, _REQUAL_STATE_KEY, today):
+            return False
+
+    try:
+        await _run_daily_requalification()
+    except Exception:
+        async with async_session() as db:
+            await _release_daily_run(db, _REQUAL_STATE_KEY, today, previous)
+        raise
+    return True
 
 
 async def requalification_loop() -> None:
     """
-    Runs **hourly**. If it hasn't fired today yet, runs re-qualification
+    Runs **hourly**. If no worker has fired today yet, runs re-qualification
     for Pro/Enterprise users.
 
-    Uses an hourly cadence + date check instead of ``asyncio.sleep(86400)``
-    to avoid drift on server restarts.
+    Uses an hourly cadence + a date flag in ``scheduler_state`` instead of
+    ``asyncio.sleep(86400)`` to avoid drift on server restarts and duplicate
+    daily passes when several workers run the loop.
     """
-    global _last_requalification_date
     logger.info("Re-qualification loop started")
 
     while True:
         try:
-            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            if _last_requalification_date != today:
-                await _run_daily_requalification()
-                _last_requalification_date = today
+            await _requalify_if_due(_utcnow().strftime("%Y-%m-%d"))
         except Exception as e:
             logger.error("Re-qualification loop error: %s", e, exc_info=True)
 
         await asyncio.sleep(3600)  # Check every hour
 
 
+# Hot leads are re-scored once their latest snapshot is older than this
+REQUALIFY_AFTER = timedelta(days=30)
+
+# Lead statuses that are closed and never re-qualified
+_CLOSED_LEAD_STATUSES = ("won", "lost", "archived")
+
+
+def _stale_hot_leads_exist(cutoff: datetime):
+    """EXISTS clause: the profile owns an open hot lead with no snapshot since *cutoff*."""
+    recent_snapshot = (
+        select(LeadSnapshot.id)
+        .where(
+            LeadSnapshot.lead_id == QualifiedLead.id,
+            LeadSnapshot.snapshot_at >= cutoff,
+        )
+        .exists()
+    )
+    return (
+        select(QualifiedLead.id)
+        .join(Search, QualifiedLead.search_id == Search.id)
+        .where(
+            Search.user_id == Profile.id,
+            QualifiedLead.tier == "hot",
+            QualifiedLead.status.notin_(_CLOSED_LEAD_STATUSES),
+            ~recent_snapshot,
+        )
+        .exists()
+    )
+
+
 async def _run_daily_requalification() -> None:
     """Re-qualify hot leads that haven't been re-scored in 30+ days."""
     from notifications import send_requalification_alert
@@ -395,10 +534,14 @@ async def _run_daily_requalification() -> None:
     logger.info("Running daily re-qualification check")
 
     async with async_session() as db:
-        # Find users with Pro or Enterprise plans
+        # Only Pro/Enterprise users that actually have a stale hot lead —
+        # users with nothing to re-qualify never reach the per-user query.
         pro_users = (
             await db.execute(
-                select(Profile).where(Profile.plan.in_(["pro", "enterprise"]))
+                select(Profile).where(
+                    Profile.plan.in_(["pro", "enterprise"]),
+                    _stale_hot_leads_exist(_utcnow() - REQUALIFY_AFTER),
+                )
             )
         ).scalars().all()
 
@@ -420,7 +563,10 @@ async def _requalify_user_leads(db, user: Profile) -> None:
 
     # Determine caps by tier
     max_leads = 50 if user.plan == "pro" else 200  # Enterprise gets more
-    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+    # One clock read for the whole pass — reused for the cutoff and every
+    # ``last_seen_at`` bump below.
+    now = _utcnow()
+    cutoff = now - REQUALIFY_AFTER
 
     # Find hot leads not re-qualified in 30+ days
     # Subquery: latest snapshot date per lead
@@ -441,7 +587,7 @@ async def _requalify_user_leads(db, user: Profile) -> None:
             .where(
                 Search.user_id == user.id,
                 QualifiedLead.tier == "hot",
-                QualifiedLead.status.notin_(["won", "lost", "archived"]),
+                QualifiedLead.status.notin_(_CLOSED_LEAD_STATUSES),
                 # Either no snapshot, or last snapshot > 30 days ago
                 (latest_snapshot_sq.c.latest_snapshot.is_(None))
                 | (latest_snapshot_sq.c.latest_snapshot < cutoff),
@@ -551,7 +697,7 @@ async def _requalify_user_leads(db, user: Profile) -> None:
                 lead.tier = new_tier
                 lead.reasoning = qual_result.reasoning
                 lead.key_signals = qual_result.key_signals
-                lead.last_seen_at = datetime.now(timezone.utc)
+                lead.last_seen_at = now
 
             # Track significant changes (±2 or more)
             if abs(new_score - old_score) >= 2:
@@ -5,23 +5,38 @@ Visits company websites using a headless Chromium browser and extracts:
   - Full page content as clean Markdown (for LLM text analysis)
   - Screenshot as base64 JPEG (for LLM vision analysis)
 
-Falls back to httpx + html2text if crawl4ai can't be imported (e.g. on
-Python 3.9 where crawl4ai ≥0.6 uses X|None syntax requiring 3.10+).
+Falls back to httpx + a lexbor (selectolax) or regex HTML→markdown pass if
+crawl4ai can't be imported (e.g. on Python 3.9 where crawl4ai ≥0.6 uses
+X|None syntax requiring 3.10+).
 
 Key functions:
   - crawl_company(url)  → CrawlResult with markdown + screenshot
   - batch_crawl(urls)   → Crawl multiple URLs with concurrency control
+                          (reuses one process-wide pool, see get_global_pool)
+  - batch_crawl_iter(urls) → Same, yielding results as they complete
   - truncate_to_tokens() → Trim content to stay within LLM token limits
   - resize_screenshot()  → Compress screenshots to save vision API costs
+  - resize_screenshot_bytes() → Same, for raw image bytes (no base64 round-trip)
 """
 
 import asyncio
 import base64
+import codecs
+import copy
+import hashlib
+import importlib.util
+import inspect
+from html import unescape
 from io import BytesIO
-from typing import Optional
+from typing import AsyncIterator, Optional, Union
 import logging
+import random
 import time
 import re
+import string
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
 
 import httpx
 
@@ -35,35 +50,205 @@ from config import (
 
 logger = logging.getLogger(__name__)
 
-# ── Try importing crawl4ai (requires Python 3.10+) ──────────────
-_HAS_CRAWL4AI = False
+# ── crawl4ai (requires Python 3.10+) ────────────────────────────
+# Imported on first use by _load_crawl4ai(): it pulls in Playwright and adds
+# most of a second to the import of this module, which scripts that only
+# need truncate_to_tokens() shouldn't pay for.
+_HAS_CRAWL4AI = importlib.util.find_spec("crawl4ai") is not None
+_CRAWL4AI_LOADED = False
+if not _HAS_CRAWL4AI:
+    logger.warning("crawl4ai not installed — falling back to httpx text-only crawling")
+# Stubs until _load_crawl4ai() binds the real names
+AsyncWebCrawler = None  # type: ignore
+BrowserConfig = None  # type: ignore
+CrawlerRunConfig = None  # type: ignore
+CacheMode = None  # type: ignore
+
+# ── Optional libjpeg-turbo encoder (PyTurboJPEG); PIL's encoder otherwise ──
+# TurboJPEG() raises if the system libturbojpeg is missing, hence the broad except.
 try:
-    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-    from PIL import Image
-    _HAS_CRAWL4AI = True
-    logger.info("crawl4ai loaded — using Playwright browser-based crawling")
-except Exception as _import_err:
-    logger.warning("crawl4ai not available (%s) — falling back to httpx text-only crawling", _import_err)
-    # Stubs so the rest of the module can reference these names
-    AsyncWebCrawler = None  # type: ignore
-    BrowserConfig = None  # type: ignore
-    CrawlerRunConfig = None  # type: ignore
-    CacheMode = None  # type: ignore
-    Image = None  # type: ignore
-
-
-# Default browser config (shared across the module) — only if crawl4ai available
-_DEFAULT_BROWSER_CONFIG = (
-    BrowserConfig(
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420, TJFLAG_PROGRESSIVE
+    _TURBOJPEG = TurboJPEG()
+except Exception:
+    _TURBOJPEG = None
+
+# ── Optional SIMD base64 (pybase64) for multi-MB screenshot strings; same API as stdlib ──
+try:
+    import pybase64 as _b64
+except Exception:
+    _b64 = base64
+
+# ── Optional C HTML parser for the httpx fallback (lexbor via selectolax) ──
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except Exception:
+    LexborHTMLParser = None  # type: ignore
+
+
+# Vision analysis only needs what's above the fold. Newer crawl4ai can
+# capture just the viewport (no scroll-and-stitch); on older releases the
+# full-page capture is cropped to the viewport's proportions before resizing.
+_VIEWPORT_ASPECT = SCREENSHOT_HEIGHT / SCREENSHOT_WIDTH
+
+# Set by _load_crawl4ai(): default browser config (shared across the module),
+# viewport-screenshot support, and the two run configs.
+_DEFAULT_BROWSER_CONFIG = None
+_VIEWPORT_SCREENSHOT_KWARGS: dict = {}
+_RUN_CONFIGS: dict = {}
+
+
+def _make_run_config(take_screenshot: bool) -> "CrawlerRunConfig":
+    return CrawlerRunConfig(
+        cache_mode=CacheMode.BYPASS,
+        page_timeout=REQUEST_TIMEOUT * 1000,
+        wait_until="domcontentloaded",
+        screenshot=take_screenshot,
+        remove_overlay_elements=True,
+        exclude_external_links=True,
+        **_VIEWPORT_SCREENSHOT_KWARGS,
+    )
+
+
+def _load_crawl4ai() -> bool:
+    """
+    Import crawl4ai and build the shared configs on first use.
+    Returns False (leaving the module on the httpx fallback) if it can't be imported.
+    """
+    global _HAS_CRAWL4AI, _CRAWL4AI_LOADED, AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+    global _DEFAULT_BROWSER_CONFIG, _VIEWPORT_SCREENSHOT_KWARGS, _RUN_CONFIGS
+    if _CRAWL4AI_LOADED or not _HAS_CRAWL4AI:
+        return _HAS_CRAWL4AI
+    try:
+        from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+    except Exception as import_err:
+        logger.warning("crawl4ai not available (%s) — falling back to httpx text-only crawling", import_err)
+        _HAS_CRAWL4AI = False
+        return False
+
+    _DEFAULT_BROWSER_CONFIG = BrowserConfig(
         headless=True,
         viewport_width=SCREENSHOT_WIDTH,
         viewport_height=SCREENSHOT_HEIGHT,
     )
-    if _HAS_CRAWL4AI
-    else None
+    if "force_viewport_screenshot" in inspect.signature(CrawlerRunConfig).parameters:
+        _VIEWPORT_SCREENSHOT_KWARGS = {"force_viewport_screenshot": True}
+    # Run configs are identical for every URL — build the two variants once.
+    # These are templates: the Playwright strategy writes config.url on every
+    # crawl, so each crawl works on its own copy (see _do_crawl).
+    _RUN_CONFIGS = {True: _make_run_config(True), False: _make_run_config(False)}
+    _CRAWL4AI_LOADED = True
+    logger.info("crawl4ai loaded — using Playwright browser-based crawling")
+    return True
+
+
+# ── httpx fallback client settings ──────────────────────────────
+# HTTP/2 multiplexes repeat requests to one host over a single connection;
+# brotli roughly halves bytes on the wire for sites that serve it.
+# Both need optional extras (h2 / brotli), so only enable them when present.
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_BROTLI_AVAILABLE = (
+    importlib.util.find_spec("brotli") is not None
+    or importlib.util.find_spec("brotlicffi") is not None
+)
+# Built once and shared by every fallback client
+_DEFAULT_HEADERS = httpx.Headers({
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br" if _BROTLI_AVAILABLE else "gzip, deflate",
+})
+# Longest single retry sleep — keeps backoff from growing into multi-minute waits
+_BACKOFF_CAP = 30.0
+# Idle connections must outlive the longest jittered retry sleep (1.25 × cap)
+# so a retry reuses the same TCP+TLS session instead of re-handshaking.
+_HTTPX_LIMITS = httpx.Limits(
+    max_connections=200,
+    max_keepalive_connections=50,
+    keepalive_expiry=_BACKOFF_CAP * 2,
 )
 
 
+def _new_httpx_client() -> httpx.AsyncClient:
+    """Build the fallback-mode HTTP client (pooled, HTTP/2 + brotli when available)."""
+    return httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE,
+        limits=_HTTPX_LIMITS,
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
+        follow_redirects=True,
+        headers=_DEFAULT_HEADERS,
+    )
+
+
+def _backoff(attempt: int, base: float = 1.0, cap: float = _BACKOFF_CAP) -> float:
+    """
+    Exponential backoff delay for retry *attempt* (1-based) with ±25% jitter.
+
+    Jitter decorrelates retries from concurrent ``batch_crawl`` workers that
+    failed on the same host at the same moment.
+    """
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay * (0.75 + random.random() * 0.5)
+
+
+# 4xx statuses that are worth retrying (request timeout, rate limited).
+# Every other 4xx is deterministic — retrying just burns backoff sleeps.
+_RETRIABLE_4XX = frozenset({408, 429})
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a numeric ``Retry-After`` header (capped), or None if absent/unparseable."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(_BACKOFF_CAP, max(0.0, float(value)))
+    except ValueError:
+        return None  # HTTP-date form — fall back to normal backoff
+
+
+# ── Process-wide fallback HTTP client ───────────────────────────
+# One connection pool for every fallback fetch, so TLS sessions and HTTP/2
+# connections are reused across pools, batches and contact-page probes.
+# Like the global pool, it is tied to the event loop that created it.
+_SHARED_CLIENT: Optional[httpx.AsyncClient] = None
+_SHARED_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Return the shared fallback httpx client, creating it on first use."""
+    global _SHARED_CLIENT, _SHARED_CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _SHARED_CLIENT is None or _SHARED_CLIENT.is_closed or _SHARED_CLIENT_LOOP is not loop:
+        _SHARED_CLIENT, _SHARED_CLIENT_LOOP = _new_httpx_client(), loop
+    return _SHARED_CLIENT
+
+
+# Restart the pooled Chromium after this many pages to cap its memory growth
+_BROWSER_RECYCLE_PAGES = 50
+
+# Per-pool memo of successful crawls — repeats within a batch/run are served
+# from memory instead of re-rendering the page. Sized for the pages in flight
+# across a batch (CONCURRENCY_LIMIT leads x homepage + contact probes); it lives
+# on the process-wide pool, so it holds text only — never screenshots.
+_RESULT_TTL = 600.0
+_RESULT_CACHE_SIZE = 64
+
+
+def _normalize_url(url: str) -> str:
+    """Canonical form for de-duplication: https default, lowercase host, no fragment/trailing slash."""
+    if not url.startswith(('http://', 'https://')):
+        url = f"https://{url}"
+    parsed = urlparse(url)
+    path = parsed.path.rstrip('/')
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}{path}{query}"
+
+
+# Contact/about/team pages fetched at once per site by crawl_contact_pages
+_CONTACT_PROBE_CONCURRENCY = 4
+
+
 class CrawlerPool:
     """
     Manages a shared browser instance so we don't launch/kill Chromium 
@@ -78,41 +263,131 @@ class CrawlerPool:
     """
     
     def __init__(self, browser_config=None):
-        self._browser_config = browser_config or _DEFAULT_BROWSER_CONFIG
+        self._browser_config = browser_config
         self._crawler = None
         self._httpx_client: Optional[httpx.AsyncClient] = None
+        # Recent successful results + crawls in progress, keyed by (normalised URL, screenshot)
+        self._recent: "OrderedDict[tuple[str, bool], tuple[float, CrawlResult]]" = OrderedDict()
+        self._pending: dict[tuple[str, bool], asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}  # callers awaiting each pending crawl
+        # Browser recycling (see _browser_crawl)
+        self._pages_served = 0
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._restart_lock = asyncio.Lock()
     
     async def __aenter__(self):
-        if _HAS_CRAWL4AI:
+        if _load_crawl4ai():
+            self._browser_config = self._browser_config or _DEFAULT_BROWSER_CONFIG
             self._crawler = AsyncWebCrawler(config=self._browser_config)
             await self._crawler.__aenter__()
         else:
-            self._httpx_client = httpx.AsyncClient(
-                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
-                follow_redirects=True,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                    "Accept-Language": "en-US,en;q=0.9",
-                },
-            )
+            self._httpx_client = get_shared_client()
         return self
     
     async def __aexit__(self, *args):
         if self._crawler:
             await self._crawler.__aexit__(*args)
             self._crawler = None
-        if self._httpx_client:
-            await self._httpx_client.aclose()
-            self._httpx_client = None
+        # The httpx client is process-wide (see get_shared_client) — not ours to close
+        self._httpx_client = None
     
     async def crawl(self, url: str, take_screenshot: bool = True) -> CrawlResult:
-        """Crawl a single URL using the shared browser (or httpx fallback)."""
+        """
+        Crawl a single URL using the shared browser (or httpx fallback).
+
+        Successful results are remembered (without screenshots) for
+        _RESULT_TTL seconds, and concurrent requests for the same URL share
+        one crawl.
+        """
+        key = (_normalize_url(url), bool(take_screenshot))
+        cached = self._recent.get(key)
+        if cached is not None:
+            expires_at, result = cached
+            if expires_at > time.monotonic():
+                self._recent.move_to_end(key)
+                return result
+            del self._recent[key]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._crawl_uncached(url, take_screenshot))
+            self._pending[key] = task
+            task.add_done_callback(lambda t: self._remember(key, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shielded: one caller giving up must not cancel the crawl for the others
+            return await asyncio.shield(task)
+        finally:
+            left = self._waiters.pop(task) - 1
+            if left:
+                self._waiters[task] = left
+            elif not task.done():
+                # The last caller gave up — don't leave the crawl running in the background
+                task.cancel()
+                if self._pending.get(key) is task:
+                    del self._pending[key]
+
+    def _remember(self, key: tuple[str, bool], task: asyncio.Future) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if task.cancelled() or task.exception() is not None or not task.result().success:
+            return
+        result = task.result()
+        if result.screenshot_base64:
+            # Screenshots run to hundreds of KB — keep the text, which still
+            # serves later text-only requests for the page
+            key = (key[0], False)
+            result = result.model_copy(update={"screenshot_base64": None})
+
+        now = time.monotonic()
+        for stale in [k for k, (expires_at, _) in self._recent.items() if expires_at <= now]:
+            del self._recent[stale]
+        self._recent[key] = (now + _RESULT_TTL, result)
+        self._recent.move_to_end(key)
+        if len(self._recent) > _RESULT_CACHE_SIZE:
+            self._recent.popitem(last=False)
+
+    async def _crawl_uncached(self, url: str, take_screenshot: bool) -> CrawlResult:
         if _HAS_CRAWL4AI and self._crawler:
-            return await _do_crawl(url, take_screenshot, self._crawler)
+            return await self._browser_crawl(url, take_screenshot)
         else:
             return await _do_crawl_httpx(url, self._httpx_client)
 
+    async def _browser_crawl(self, url: str, take_screenshot: bool, **retry_kwargs) -> CrawlResult:
+        """
+        Run _do_crawl on the shared browser, restarting Chromium every
+        _BROWSER_RECYCLE_PAGES pages — a long-lived browser (the global pool
+        lives as long as the process) otherwise grows without bound.
+        The restart waits for in-flight crawls; new ones queue behind it.
+        """
+        if self._pages_served >= _BROWSER_RECYCLE_PAGES:
+            await self._restart_browser()
+        self._pages_served += 1
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            return await _do_crawl(url, take_screenshot, self._crawler, **retry_kwargs)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def _restart_browser(self) -> None:
+        async with self._restart_lock:
+            if self._pages_served < _BROWSER_RECYCLE_PAGES:
+                return  # Another caller restarted it while we waited
+            await self._idle.wait()
+            old, self._crawler = self._crawler, AsyncWebCrawler(config=self._browser_config)
+            self._pages_served = 0
+            try:
+                await old.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning("Error closing recycled browser: %s", e)
+            await self._crawler.__aenter__()
+            logger.info("Recycled crawler browser after %d pages", _BROWSER_RECYCLE_PAGES)
+
     async def crawl_contact_pages(self, base_url: str) -> Optional[str]:
         """
         Try to find and crawl contact/about/team pages to extract people & contact info.
@@ -127,7 +402,6 @@ class CrawlerPool:
             base_url = f"https://{base_url}"
 
         # Strip trailing slashes / paths to get the root domain
-        from urllib.parse import urlparse
         parsed = urlparse(base_url)
         root = f"{parsed.scheme}://{parsed.netloc}"
 
@@ -141,37 +415,135 @@ class CrawlerPool:
             "/impressum",
         ]
 
-        snippets: list[str] = []
+        # Aliases like /about and /about-us often redirect to one page — track
+        # where each probe landed so the same page isn't crawled or kept twice.
+        seen_urls: set[str] = set()
 
-        for path in _CONTACT_PATHS:
-            if len(snippets) >= 3:
-                break  # Got enough — don't waste time on more pages
+        async def probe(path: str) -> Optional[str]:
             try:
                 page_url = root + path
+                if _normalize_url(page_url) in seen_urls:
+                    return None  # Another alias already landed here
                 if _HAS_CRAWL4AI and self._crawler:
-                    result = await _do_crawl(page_url, False, self._crawler, max_retries=1, base_delay=0.5)
+                    result = await self._browser_crawl(page_url, False, max_retries=1, base_delay=0.5)
                 else:
                     result = await _do_crawl_httpx(page_url, self._httpx_client, max_retries=1, base_delay=0.5)
 
                 if not result.success or not result.markdown_content:
-                    continue
+                    return None
+                landed = _normalize_url(result.final_url or page_url)
+                if landed in seen_urls:
+                    return None
+                seen_urls.add(landed)
 
                 # Clean the full page content (remove nav/footer junk) but keep ALL
                 # people, emails, phones — don't filter to just address lines.
                 cleaned = _clean_page_content(result.markdown_content)
                 if cleaned and len(cleaned) > 30:
-                    snippets.append(f"--- Content from {path} page ---\n{cleaned}")
                     logger.info("Found contact content on %s%s (%d chars)", root, path, len(cleaned))
-
+                    return f"--- Content from {path} page ---\n{cleaned}"
             except Exception as e:
                 logger.debug("Contact page crawl failed for %s%s: %s", root, path, e)
-                continue
+            return None
+
+        # Most paths miss, so probe them concurrently rather than paying each
+        # miss in turn; stop (and cancel the rest) once we have enough.
+        semaphore = asyncio.Semaphore(_CONTACT_PROBE_CONCURRENCY)
+
+        async def bounded_probe(index: int, path: str) -> tuple[int, Optional[str]]:
+            async with semaphore:
+                return index, await probe(path)
+
+        tasks = [asyncio.ensure_future(bounded_probe(i, p)) for i, p in enumerate(_CONTACT_PATHS)]
+        found: list[tuple[int, str]] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, snippet = await next_done
+                if snippet:
+                    found.append((index, snippet))
+                    if len(found) >= 3:
+                        break  # Got enough — don't waste time on more pages
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # Keep the priority order of _CONTACT_PATHS, not completion order
+        snippets = [snippet for _, snippet in sorted(found)]
 
         if not snippets:
             return None
         return "\n\n".join(snippets)
 
 
+# ── Process-wide pool shared by batch_crawl ──────────────────────
+# Launching Chromium costs seconds; reusing one pool across batches pays it once.
+# The pool is tied to the event loop that created it, so a new loop gets a new pool.
+_GLOBAL_POOL: Optional[CrawlerPool] = None
+_GLOBAL_POOL_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_GLOBAL_POOL_LOCK: Optional[asyncio.Lock] = None
+
+
+async def get_global_pool() -> CrawlerPool:
+    """Return the shared CrawlerPool, launching it on first use."""
+    global _GLOBAL_POOL, _GLOBAL_POOL_LOOP, _GLOBAL_POOL_LOCK
+    loop = asyncio.get_running_loop()
+    if _GLOBAL_POOL_LOOP is not loop:
+        # First call, or a previous loop was closed (its pool died with it)
+        _GLOBAL_POOL, _GLOBAL_POOL_LOOP, _GLOBAL_POOL_LOCK = None, loop, asyncio.Lock()
+    async with _GLOBAL_POOL_LOCK:
+        if _GLOBAL_POOL is None:
+            pool = CrawlerPool()
+            await pool.__aenter__()
+            _GLOBAL_POOL = pool
+    return _GLOBAL_POOL
+
+
+async def close_global_pool() -> None:
+    """Shut down the shared pool and HTTP client (call from app shutdown). Safe if never started."""
+    global _GLOBAL_POOL, _SHARED_CLIENT
+    loop = asyncio.get_running_loop()
+    if _SHARED_CLIENT is not None and _SHARED_CLIENT_LOOP is loop:
+        client, _SHARED_CLIENT = _SHARED_CLIENT, None
+        await client.aclose()
+    if _GLOBAL_POOL_LOCK is None or _GLOBAL_POOL_LOOP is not loop:
+        return
+    async with _GLOBAL_POOL_LOCK:
+        pool, _GLOBAL_POOL = _GLOBAL_POOL, None
+        if pool is not None:
+            await pool.__aexit__(None, None, None)
+
+
+# Lines to strip: nav/menu items, cookie banners, social media links, etc.
+_SKIP_PATTERNS = [
+    r'^\s*-?\s*\[.*\]\(https?://.*\)\s*$',      # Markdown links: - [text](url)
+    r'^\s*(?:NAVIGATION|MENU|RESOURCES|QUICK LINKS|PRODUCTS|SOLUTIONS|SERVICES)\s*$',
+    r'^\s*©\s*\d{4}',                             # Copyright lines
+    r'^#{1,3}\s+(?:We\s+value|Cookie|Privacy)',    # Cookie/privacy banners
+    r'Read\s*More\s*\]',                           # "Read More" links
+    r'^\s*\|?\s*\[?\s*(?:Facebook|Twitter|Instagram|YouTube|Pinterest)\s*\]?\s*\|?\s*$',
+    r'^\s*(?:Skip to (?:content|main)|Back to top)\s*$',
+    r'^\s*\*{3,}\s*$',                            # Markdown dividers
+    r'^\s*!\[.*\]\(.*\)\s*$',                      # Image-only lines
+]
+# Fused into one alternation so each line costs a single regex scan
+_SKIP_RE = re.compile("|".join(f"(?:{p})" for p in _SKIP_PATTERNS), re.IGNORECASE)
+# Every skip pattern either needs one of these characters, starts with # or *,
+# or matches a whole short line ("MENU", "Skip to content", "Facebook").
+# Longer lines without them — i.e. most prose — can't match, so they skip
+# the regex (whose unanchored "Read More]" branch tries every position).
+_SKIP_TRIGGER_CHARS = "[]|©"
+_SKIP_SHORT_LINE = 20
+
+
+def _may_be_boilerplate(line: str) -> bool:
+    """Cheap prefilter for _SKIP_RE: False means the line definitely won't match."""
+    return (
+        len(line) <= _SKIP_SHORT_LINE
+        or line[0] in "#*"
+        or any(ch in line for ch in _SKIP_TRIGGER_CHARS)
+    )
+
+
 def _clean_page_content(markdown: str) -> Optional[str]:
     """
     Clean crawled page markdown by removing navigation, cookie banners, and
@@ -182,31 +554,16 @@ def _clean_page_content(markdown: str) -> Optional[str]:
     address-adjacent lines. It returns the full useful content so the LLM
     can find people + their contact details wherever they appear on the page.
     """
-    import re as _re
-
-    # Lines to strip: nav/menu items, cookie banners, social media links, etc.
-    _SKIP_PATTERNS = [
-        r'^\s*-?\s*\[.*\]\(https?://.*\)\s*$',      # Markdown links: - [text](url)
-        r'^\s*(?:NAVIGATION|MENU|RESOURCES|QUICK LINKS|PRODUCTS|SOLUTIONS|SERVICES)\s*$',
-        r'^\s*©\s*\d{4}',                             # Copyright lines
-        r'^#{1,3}\s+(?:We\s+value|Cookie|Privacy)',    # Cookie/privacy banners
-        r'Read\s*More\s*\]',                           # "Read More" links
-        r'^\s*\|?\s*\[?\s*(?:Facebook|Twitter|Instagram|YouTube|Pinterest)\s*\]?\s*\|?\s*$',
-        r'^\s*(?:Skip to (?:content|main)|Back to top)\s*$',
-        r'^\s*\*{3,}\s*$',                            # Markdown dividers
-        r'^\s*!\[.*\]\(.*\)\s*$',                      # Image-only lines
-    ]
-
     lines = markdown.split('\n')
     result_lines: list[str] = []
 
     for line in lines:
         stripped = line.strip()
-        # Skip empty, very short, or very long lines
-        if not stripped or len(stripped) < 3 or len(stripped) > 500:
+        # Skip empty, very short, or very long lines (one len() call)
+        if not 3 <= len(stripped) <= 500:
             continue
         # Skip navigation/boilerplate
-        if any(_re.search(pat, stripped, _re.IGNORECASE) for pat in _SKIP_PATTERNS):
+        if _may_be_boilerplate(stripped) and _SKIP_RE.search(stripped):
             continue
         result_lines.append(stripped)
 
@@ -214,9 +571,10 @@ def _clean_page_content(markdown: str) -> Optional[str]:
         return None
 
     result = '\n'.join(result_lines)
-    # Cap at ~4000 chars per page (leaves room for 2-3 pages + homepage in the 8000 char LLM window)
+    # Cap at ~4000 chars per page (leaves room for 2-3 pages + homepage in the 8000 char LLM window).
+    # Trim long sections first so a short Contact/Team section at the end isn't lost.
     if len(result) > 4000:
-        result = result[:4000] + "\n[truncated]"
+        result = (_fit_sections(result, 4000) or result[:4000]) + "\n[truncated]"
 
     return result if len(result) > 30 else None
 
@@ -234,14 +592,10 @@ async def _do_crawl(
     if not url.startswith(('http://', 'https://')):
         url = f"https://{url}"
     
-    crawler_config = CrawlerRunConfig(
-        cache_mode=CacheMode.BYPASS,
-        page_timeout=REQUEST_TIMEOUT * 1000,
-        wait_until="domcontentloaded",
-        screenshot=take_screenshot,
-        remove_overlay_elements=True,
-        exclude_external_links=True,
-    )
+    # Own copy per crawl: arun sets config.url, and concurrent crawls sharing one
+    # object could read each other's URL during page setup. A shallow copy costs
+    # microseconds; clone()/a rebuild goes through from_kwargs (~25 ms).
+    crawler_config = copy.copy(_RUN_CONFIGS[bool(take_screenshot)])
 
     last_error: str = ""
 
@@ -252,7 +606,7 @@ async def _do_crawl(
             if not result.success:
                 last_error = f"Crawl failed: {result.error_message or 'Unknown error'}"
                 if attempt < max_retries:
-                    delay = base_delay * (2 ** (attempt - 1))
+                    delay = _backoff(attempt, base_delay)
                     logger.debug("Retry %d/%d for %s in %.1fs -- %s", attempt, max_retries, url, delay, last_error)
                     await asyncio.sleep(delay)
                     continue
@@ -268,15 +622,21 @@ async def _do_crawl(
             
             screenshot_base64 = None
             if take_screenshot and result.screenshot:
-                screenshot_base64 = resize_screenshot(result.screenshot)
+                # Decode/resize/encode is CPU-bound — keep it off the event loop
+                # so other crawls in the batch keep navigating meanwhile.
+                screenshot_base64 = await asyncio.to_thread(_prepare_screenshot, result.screenshot)
             
             title = None
             if result.metadata and isinstance(result.metadata, dict):
                 title = result.metadata.get('title')
+
+            # redirected_url only exists on newer crawl4ai releases
+            redirected_url = getattr(result, 'redirected_url', None)
             
             return CrawlResult(
                 url=url,
                 success=True,
+                final_url=redirected_url if isinstance(redirected_url, str) else None,
                 markdown_content=markdown_content,
                 screenshot_base64=screenshot_base64,
                 title=title,
@@ -289,7 +649,7 @@ async def _do_crawl(
             last_error = f"Exception: {str(e)[:200]}"
 
         if attempt < max_retries:
-            delay = base_delay * (2 ** (attempt - 1))
+            delay = _backoff(attempt, base_delay)
             logger.debug("Retry %d/%d for %s in %.1fs -- %s", attempt, max_retries, url, delay, last_error)
             await asyncio.sleep(delay)
 
@@ -303,28 +663,196 @@ async def _do_crawl(
 
 # ── httpx fallback (Python 3.9 / no Playwright) ──────────────────
 
+# Precompiled patterns for the regex HTML→markdown path and <title> extraction
+# One alternation for every tag rewrite, so the HTML is walked once.
+# Branch order matters: headings and links consume their closing tag.
+_RE_HTML_FUSED = re.compile(
+    r'<h(?P<level>[1-6])[^>]*>(?P<heading>.*?)</h(?P=level)\s*>'
+    r'|<a[^>]+href="(?P<href>[^"]*)"[^>]*>(?P<link>.*?)</a\s*>'
+    r'|(?P<block><(?:br|hr|/p|/div|/h[1-6]|/li|/tr)[^>]*>)'
+    r'|(?P<li><li\b[^>]*>)'
+    r'|<[^>]+>',
+    re.S | re.I,
+)
+_RE_WS = re.compile(r'[ \t]+')
+_RE_NL = re.compile(r'\n{3,}')
+_RE_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.S | re.I)
+
+# Stop downloading a page after this many bytes — the markdown is truncated to
+# MAX_TOKENS_INPUT * 4 chars anyway; 4× slack covers markup-heavy HTML.
+_MAX_HTML_BYTES = MAX_TOKENS_INPUT * 4 * 4
+
+# Tags whose content ends a line in the markdown output
+_BLOCK_TAGS = frozenset({
+    "p", "div", "br", "hr", "tr", "li", "ul", "ol", "table", "section",
+    "article", "header", "footer", "main", "nav", "aside", "blockquote", "form",
+})
+_HEADING_LEVELS = {f"h{i}": i for i in range(1, 7)}
+
+
 def _html_to_markdown(html: str) -> str:
+    """HTML→markdown-ish text. Uses the lexbor DOM parser when installed, else regex."""
+    if LexborHTMLParser is not None:
+        return _html_to_markdown_dom(html)
+    return _html_to_markdown_regex(html)
+
+
+def _html_to_markdown_dom(html: Union[str, bytes]) -> str:
+    """Single DOM walk (C parser) emitting headings, list items and links as markdown."""
+    return _dom_to_markdown(LexborHTMLParser(html))
+
+
+def _dom_to_markdown(tree) -> str:
+    """Walk a parsed lexbor tree into markdown-ish text (strips code elements in place)."""
+    tree.strip_tags(["script", "style", "noscript"])
+    root = tree.body or tree.root
+    if root is None:
+        return ""
+
+    out: list[str] = []
+    # Explicit stack instead of recursion — deeply nested pages can't blow it.
+    # Entries are nodes to visit or literal strings queued after a node's children.
+    stack: list = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            out.append(node)
+            continue
+        tag = node.tag
+        if tag == "-text":
+            out.append(node.text(deep=False))
+            continue
+        if tag.startswith("-"):  # comments, doctype
+            continue
+        level = _HEADING_LEVELS.get(tag)
+        if level:
+            out.append(f"\n{'#' * level} {node.text(separator=' ', strip=True)}\n")
+            continue
+        if tag == "a":
+            href = node.attributes.get("href")
+            if href is not None:
+                out.append(f"[{node.text(separator=' ', strip=True)}]({href})")
+                continue
+        if tag == "li":
+            out.append("- ")
+        if tag in _BLOCK_TAGS:
+            stack.append("\n")
+        stack.extend(reversed(list(node.iter(include_text=True))))
+
+    text = "".join(out).replace("\xa0", " ")
+    text = _RE_WS.sub(' ', text)
+    text = _RE_NL.sub('\n\n', text)
+    return text.strip()
+
+
+# Charsets lexbor can parse from bytes as-is (it assumes UTF-8)
+_UTF8_COMPATIBLE = frozenset({"utf-8", "ascii"})
+
+
+def _page_markdown_and_title(raw: bytes, encoding: str) -> tuple[str, Optional[str]]:
+    """
+    Markdown + <title> for a downloaded page.
+
+    UTF-8 bodies go to lexbor as raw bytes — it decodes while parsing, so
+    we never materialise a Python str of the whole (markup-heavy) page.
+    Other charsets, or no lexbor, decode first and take the str path.
+    """
+    if LexborHTMLParser is not None and codecs.lookup(encoding).name in _UTF8_COMPATIBLE:
+        tree = LexborHTMLParser(bytes(raw))
+        title_node = tree.css_first("title")
+        title = title_node.text(strip=True) if title_node is not None else None
+        return _dom_to_markdown(tree), title or None
+
+    html = raw.decode(encoding, errors="replace")
+    title_match = _RE_TITLE.search(html)
+    title = unescape(title_match.group(1)).strip() if title_match else None
+    return _html_to_markdown(html), title
+
+
+# Elements whose content is never visible text
+_CODE_TAGS = ("script", "style", "noscript")
+# ASCII-only lowercasing — unlike str.lower() it never changes the string's
+# length, so offsets found in the lowered copy index the original directly.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _strip_code_blocks(html: str) -> str:
+    """
+    Remove <script>/<style>/<noscript> elements in one linear pass.
+
+    Hops between tags with str.find instead of a lazy ``.*?`` regex, which
+    rescans to the end of the document for every unclosed tag (quadratic on
+    malformed pages). Once a tag's closing form is known to be absent, that
+    tag is never searched for again.
+    """
+    lower = html.translate(_ASCII_LOWER)
+    n = len(lower)
+    nxt = {tag: lower.find('<' + tag) for tag in _CODE_TAGS}
+    out = []
+    pos = 0
+    while True:
+        live = [(start, tag) for tag, start in nxt.items() if start != -1]
+        if not live:
+            break
+        start, tag = min(live)
+        name_end = start + 1 + len(tag)
+        if name_end < n and lower[name_end] not in '> \t\r\n/':
+            # Longer tag name that merely shares the prefix (<styles>, …)
+            nxt[tag] = lower.find('<' + tag, name_end)
+            continue
+        open_end = lower.find('>', name_end)
+        close = lower.find('</' + tag, open_end + 1) if open_end != -1 else -1
+        close_end = lower.find('>', close + 2 + len(tag)) if close != -1 else -1
+        if close_end == -1:
+            # Unclosed — leave it for the tag stripper, and since no later
+            # occurrence can close either, stop looking for this tag.
+            nxt[tag] = -1
+            continue
+        out.append(html[pos:start])
+        pos = close_end + 1
+        for other, other_start in nxt.items():
+            if other_start != -1 and other_start < pos:
+                nxt[other] = lower.find('<' + other, pos)
+    out.append(html[pos:])
+    return ''.join(out)
+
+
+def _fused_tag_to_markdown(m: "re.Match[str]") -> str:
+    """_RE_HTML_FUSED callback — dispatches on the branch that matched."""
+    kind = m.lastgroup
+    if kind == "heading":
+        inner = _RE_HTML_FUSED.sub(_fused_tag_to_markdown, m.group("heading")).strip()
+        return f"\n{'#' * int(m.group('level'))} {inner}\n"
+    if kind == "link":
+        inner = _RE_HTML_FUSED.sub(_fused_tag_to_markdown, m.group("link"))
+        return f"[{inner}]({m.group('href')})"
+    if kind == "block":
+        return "\n"
+    if kind == "li":
+        return "- "
+    return ""
+
+
+def _html_to_markdown_regex(html: str) -> str:
     """Rough HTML→text conversion using regex. No external deps needed."""
     # Remove script/style blocks
-    text = re.sub(r'<(script|style|noscript)[^>]*>.*?</\1>', '', html, flags=re.S | re.I)
-    # Replace common block elements with newlines
-    text = re.sub(r'<(br|hr|/p|/div|/h[1-6]|/li|/tr)[^>]*>', '\n', text, flags=re.I)
-    # Replace headings with markdown-style
-    text = re.sub(r'<h([1-6])[^>]*>(.*?)</h\1>', lambda m: '#' * int(m.group(1)) + ' ' + m.group(2), text, flags=re.S | re.I)
-    # Replace list items
-    text = re.sub(r'<li[^>]*>', '- ', text, flags=re.I)
-    # Replace links: <a href="url">text</a> → [text](url)
-    text = re.sub(r'<a[^>]+href="([^"]*)"[^>]*>(.*?)</a>', r'[\2](\1)', text, flags=re.S | re.I)
-    # Strip remaining tags
-    text = re.sub(r'<[^>]+>', '', text)
-    # Decode common HTML entities
-    text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&#39;', "'").replace('&nbsp;', ' ')
+    text = _strip_code_blocks(html)
+    # Blocks → newlines, headings/list items/links → markdown, other tags dropped
+    text = _RE_HTML_FUSED.sub(_fused_tag_to_markdown, text)
+    # Decode all named + numeric HTML entities in one C pass
+    text = unescape(text).replace('\xa0', ' ')
     # Collapse whitespace
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = _RE_WS.sub(' ', text)
+    text = _RE_NL.sub('\n\n', text)
     return text.strip()
 
 
+def _is_html_content_type(content_type: str) -> bool:
+    """True for HTML-ish (or undeclared) responses worth converting to markdown."""
+    mime = content_type.split(";", 1)[0].strip().lower()
+    return not mime or mime.startswith("text/") or mime in ("application/xhtml+xml", "application/xml")
+
+
 async def _do_crawl_httpx(
     url: str,
     client: Optional[httpx.AsyncClient] = None,
@@ -334,71 +862,84 @@ async def _do_crawl_httpx(
     """Fallback crawl using httpx when crawl4ai is unavailable.
     
     No screenshots (requires browser), but extracts text content via
-    regex-based HTML→markdown. Good enough for LLM text qualification.
+    a DOM (or regex) HTML→markdown pass. Good enough for LLM text qualification.
     """
     start_time = time.time()
 
     if not url.startswith(('http://', 'https://')):
         url = f"https://{url}"
 
-    own_client = client is None
-    if own_client:
-        client = httpx.AsyncClient(
-            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
-            follow_redirects=True,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-            },
-        )
+    if client is None:
+        client = get_shared_client()
 
     last_error = ""
-    try:
-        for attempt in range(1, max_retries + 1):
-            try:
-                resp = await client.get(url)
+    for attempt in range(1, max_retries + 1):
+        retry_after: Optional[float] = None
+        try:
+            # Stream the body and stop at the cap instead of buffering
+            # multi-MB pages we'd truncate immediately.
+            async with client.stream("GET", url) as resp:
                 resp.raise_for_status()
+                content_type = resp.headers.get("content-type", "")
+                if not _is_html_content_type(content_type):
+                    # PDF/image/etc. — nothing to convert, and it won't change on
+                    # retry. Bail before downloading the body.
+                    return CrawlResult(
+                        url=url,
+                        success=False,
+                        error_message=f"Unsupported content type: {content_type.split(';')[0]}",
+                        crawl_time_seconds=time.time() - start_time,
+                    )
+                buf = bytearray()
+                async for chunk in resp.aiter_bytes():
+                    buf.extend(chunk)
+                    if len(buf) >= _MAX_HTML_BYTES:
+                        break
+                encoding = resp.encoding or "utf-8"
 
-                html = resp.text
-                markdown_content = _html_to_markdown(html)
-                markdown_content = truncate_to_tokens(markdown_content, MAX_TOKENS_INPUT)
-
-                # Extract <title>
-                title = None
-                title_match = re.search(r'<title[^>]*>(.*?)</title>', html, re.S | re.I)
-                if title_match:
-                    title = title_match.group(1).strip()
+            # Parsing is pure CPU — run it in a worker thread so the other
+            # batch_crawl workers' downloads keep moving meanwhile.
+            markdown_content, title = await asyncio.to_thread(_page_markdown_and_title, buf, encoding)
+            markdown_content = truncate_to_tokens(markdown_content, MAX_TOKENS_INPUT)
 
+            return CrawlResult(
+                url=url,
+                success=True,
+                final_url=str(resp.url),
+                markdown_content=markdown_content,
+                screenshot_base64=None,  # No screenshots in httpx mode
+                title=title,
+                crawl_time_seconds=time.time() - start_time,
+            )
+        except httpx.TimeoutException:
+            last_error = "Timeout: Page took too long to respond"
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            last_error = f"HTTP {status}"
+            if status < 500 and status not in _RETRIABLE_4XX:
+                # 404/401/403... won't change on retry — fail fast
                 return CrawlResult(
                     url=url,
-                    success=True,
-                    markdown_content=markdown_content,
-                    screenshot_base64=None,  # No screenshots in httpx mode
-                    title=title,
+                    success=False,
+                    error_message=last_error,
                     crawl_time_seconds=time.time() - start_time,
                 )
-            except httpx.TimeoutException:
-                last_error = "Timeout: Page took too long to respond"
-            except httpx.HTTPStatusError as e:
-                last_error = f"HTTP {e.response.status_code}"
-            except Exception as e:
-                last_error = f"Exception: {str(e)[:200]}"
-
-            if attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1))
-                logger.debug("httpx retry %d/%d for %s in %.1fs -- %s", attempt, max_retries, url, delay, last_error)
-                await asyncio.sleep(delay)
-
-        return CrawlResult(
-            url=url,
-            success=False,
-            error_message=f"Failed after {max_retries} attempts: {last_error}",
-            crawl_time_seconds=time.time() - start_time,
-        )
-    finally:
-        if own_client:
-            await client.aclose()
+            if status == 429:
+                retry_after = _retry_after_seconds(e.response)
+        except Exception as e:
+            last_error = f"Exception: {str(e)[:200]}"
+
+        if attempt < max_retries:
+            delay = retry_after if retry_after is not None else _backoff(attempt, base_delay)
+            logger.debug("httpx retry %d/%d for %s in %.1fs -- %s", attempt, max_retries, url, delay, last_error)
+            await asyncio.sleep(delay)
+
+    return CrawlResult(
+        url=url,
+        success=False,
+        error_message=f"Failed after {max_retries} attempts: {last_error}",
+        crawl_time_seconds=time.time() - start_time,
+    )
 
 
 async def crawl_company(url: str, take_screenshot: bool = True, crawler_pool: 'CrawlerPool' = None) -> CrawlResult:
@@ -423,6 +964,43 @@ async def crawl_company(url: str, take_screenshot: bool = True, crawler_pool: 'C
         return await pool.crawl(url, take_screenshot)
 
 
+# Splits markdown before each h1–h3 heading line
+_RE_SECTION = re.compile(r'(?m)^(?=#{1,3} )')
+# Every section keeps at least this many chars (its heading + opening lines)
+_SECTION_FLOOR = 200
+
+
+def _fit_sections(text: str, max_chars: int) -> Optional[str]:
+    """
+    Shrink *text* to at most *max_chars* by trimming only its longest
+    heading sections. Returns None if the text has no section headings.
+
+    Finds the largest per-section cap T with sum(min(len_i, T)) <= max_chars
+    (never below _SECTION_FLOOR) and cuts each longer section to T.
+    """
+    sections = [part for part in _RE_SECTION.split(text) if part]
+    if len(sections) < 2:
+        return None
+
+    remaining = max_chars
+    cap = max_chars
+    lengths = sorted(len(part) for part in sections)
+    for i, length in enumerate(lengths):
+        left = len(lengths) - i
+        if length * left > remaining:
+            cap = remaining // left
+            break
+        remaining -= length
+    cap = max(cap, _SECTION_FLOOR)
+
+    fitted = "".join(
+        part if len(part) <= cap else part[:cap - 1].rstrip() + "\n"
+        for part in sections
+    )
+    # Only the floor can overshoot — the hard cap still holds then
+    return fitted[:max_chars]
+
+
 def truncate_to_tokens(text: str, max_tokens: int) -> str:
     """
     Truncate text to approximately max_tokens.
@@ -434,66 +1012,207 @@ def truncate_to_tokens(text: str, max_tokens: int) -> str:
     if len(text) <= max_chars:
         return text
     
-    # Truncate and add indicator
-    truncated = text[:max_chars]
+    # Sectioned markdown: trim the longest sections instead of cutting the
+    # tail, so short trailing sections (Contact, Team…) survive.
+    fitted = _fit_sections(text, max_chars)
+    if fitted is not None:
+        return fitted + "\n\n[Content truncated for processing...]"
     
-    # Try to break at a sentence boundary
-    last_period = truncated.rfind('.')
-    if last_period > max_chars * 0.8:  # Only if we don't lose too much
-        truncated = truncated[:last_period + 1]
+    # Try to break at a sentence boundary — only search the last 20% of the
+    # window (an earlier period would lose too much), and slice just once.
+    last_period = text.rfind('.', int(max_chars * 0.8) + 1, max_chars)
+    end = last_period + 1 if last_period != -1 else max_chars
     
-    return truncated + "\n\n[Content truncated for processing...]"
+    return text[:end] + "\n\n[Content truncated for processing...]"
+
+
+def _prepare_screenshot(screenshot: Union[str, bytes]) -> str:
+    """Resize a crawl4ai screenshot (base64 str or raw bytes) to base64 JPEG."""
+    if isinstance(screenshot, (bytes, bytearray)):
+        # Raw image — resize directly and base64-encode once
+        return _b64.b64encode(
+            resize_screenshot_bytes(bytes(screenshot), max_aspect=_VIEWPORT_ASPECT)
+        ).decode('ascii')
+    return resize_screenshot(screenshot, max_aspect=_VIEWPORT_ASPECT)
+
+
+# Vision models are robust to JPEG artefacts well below the usual 85
+_JPEG_QUALITY = 72
+# JPEGs at most this size that already fit the target are passed through as-is
+_SMALL_JPEG_BYTES = 150_000
+
 
+# LRU of resized screenshots: (input digest, width, max aspect) → base64 JPEG
+# (~50–150 KB each). Locked because resizes run in worker threads.
+_RESIZE_CACHE: "OrderedDict[tuple[bytes, int, Optional[float]], str]" = OrderedDict()
+_RESIZE_CACHE_SIZE = 64
+_RESIZE_CACHE_LOCK = threading.Lock()
 
-def resize_screenshot(screenshot_base64: str, target_width: int = 720) -> str:
+
+def resize_screenshot(
+    screenshot_base64: str, target_width: int = 720, max_aspect: Optional[float] = None,
+) -> str:
     """
     Resize screenshot to reduce size for vision API.
-    Converts to JPEG and resizes to target width.
+    Converts to JPEG and resizes to target width. With *max_aspect*
+    (height / width), taller images are cropped to their top part first.
+    """
+    # Retries and re-analysis resend the same screenshot — serve those from
+    # the cache. Keyed by digest so multi-MB strings aren't held as keys.
+    key = (hashlib.blake2b(screenshot_base64.encode(), digest_size=16).digest(), target_width, max_aspect)
+    with _RESIZE_CACHE_LOCK:
+        cached = _RESIZE_CACHE.get(key)
+        if cached is not None:
+            _RESIZE_CACHE.move_to_end(key)
+            return cached
+
+    try:
+        image_data = _b64.b64decode(screenshot_base64)
+    except Exception as e:
+        logger.warning("Could not resize screenshot: %s", e)
+        return screenshot_base64
+    jpeg_bytes = resize_screenshot_bytes(image_data, target_width, max_aspect)
+    if jpeg_bytes is image_data:
+        return screenshot_base64  # Already small enough, or resize failed — keep the original
+    result = _b64.b64encode(jpeg_bytes).decode('ascii')
+
+    with _RESIZE_CACHE_LOCK:
+        _RESIZE_CACHE[key] = result
+        if len(_RESIZE_CACHE) > _RESIZE_CACHE_SIZE:
+            _RESIZE_CACHE.popitem(last=False)
+    return result
+
+
+def resize_screenshot_bytes(
+    image_data: bytes, target_width: int = 720, max_aspect: Optional[float] = None,
+) -> bytes:
+    """
+    Byte-level variant of resize_screenshot() for raw image data.
+    Returns JPEG bytes, or the input unchanged if it is already a small
+    JPEG within budget or can't be resized.
     """
-    if Image is None:
-        return screenshot_base64  # PIL not available — return as-is
     try:
-        # Decode base64
-        image_data = base64.b64decode(screenshot_base64)
-        image = Image.open(BytesIO(image_data))
+        from PIL import Image  # deferred with crawl4ai; cached after the first call
+        image = Image.open(BytesIO(image_data))  # lazy — reads the header only
+        
+        # Already a small JPEG within the width (and aspect) budget — a decode +
+        # re-encode would only cost CPU and add generation loss.
+        if (
+            image.format == 'JPEG'
+            and image.width <= target_width
+            and len(image_data) <= _SMALL_JPEG_BYTES
+            and (max_aspect is None or image.height <= image.width * max_aspect)
+        ):
+            return image_data
         
         # Calculate new height maintaining aspect ratio
         aspect_ratio = image.height / image.width
+        if max_aspect is not None:
+            aspect_ratio = min(aspect_ratio, max_aspect)
         target_height = int(target_width * aspect_ratio)
         
-        # Resize
-        image = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+        # JPEG sources: let libjpeg downscale by 1/2–1/8 during decode (DCT
+        # scaling), keeping ≥2× the target so the final resample stays sharp.
+        if image.format == 'JPEG':
+            image.draft('RGB', (target_width * 2, target_height * 2))
+        
+        # Keep only the top of over-tall (full-page) captures
+        if max_aspect is not None and image.height > image.width * max_aspect:
+            image = image.crop((0, 0, image.width, round(image.width * max_aspect)))
+        
+        # Resize — bilinear (after thumbnail's box pre-reduction) is several times
+        # cheaper than LANCZOS and indistinguishable to a vision model at this size.
+        # thumbnail() never upscales, so already-narrow screenshots are kept as-is.
+        image.thumbnail((target_width, target_width * 10), Image.Resampling.BILINEAR)
         
         # Convert to RGB if necessary (for JPEG)
-        if image.mode in ('RGBA', 'P'):
+        if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Save as JPEG with moderate quality
+        # Encode as progressive 4:2:0 JPEG — chroma at quarter resolution is
+        # invisible to vision models and trims the payload noticeably.
+        # SIMD libjpeg-turbo when available.
+        if _TURBOJPEG is not None:
+            return _TURBOJPEG.encode(
+                np.asarray(image), quality=_JPEG_QUALITY, pixel_format=TJPF_RGB,
+                jpeg_subsample=TJSAMP_420, flags=TJFLAG_PROGRESSIVE,
+            )
+        # No optimize=True: libjpeg always builds optimal Huffman tables for
+        # progressive output, so the flag only added a redundant pass.
         buffer = BytesIO()
-        image.save(buffer, format='JPEG', quality=75, optimize=True)
-        
-        # Re-encode to base64
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+        image.save(
+            buffer, format='JPEG', quality=_JPEG_QUALITY,
+            progressive=True, subsampling=2,
+        )
+        return buffer.getvalue()
         
     except Exception as e:
         logger.warning("Could not resize screenshot: %s", e)
-        return screenshot_base64  # Return original if resize fails
+        return image_data
 
 
 async def batch_crawl(urls: list[str], concurrency: int = 5, take_screenshot: bool = True) -> list[CrawlResult]:
     """
-    Crawl multiple URLs in parallel using a shared browser.
-    Much faster than calling crawl_company() in a loop.
+    Crawl multiple URLs in parallel using the process-wide shared browser.
+    Much faster than calling crawl_company() in a loop, and later batches
+    skip the browser launch entirely.
+
+    Results come back in the same order as *urls*. Use batch_crawl_iter()
+    to consume them as they finish instead of holding them all in memory.
+    """
+    pool = await get_global_pool()
+    return await asyncio.gather(*_bounded_crawls(pool, urls, concurrency, take_screenshot))
+
+
+async def batch_crawl_iter(
+    urls: list[str], concurrency: int = 5, take_screenshot: bool = True,
+) -> AsyncIterator[CrawlResult]:
+    """
+    Like batch_crawl(), but yields each CrawlResult as soon as it completes
+    (completion order, not input order) so callers can start LLM work early
+    and drop results — markdown + screenshots — once processed.
+    """
+    pool = await get_global_pool()
+    tasks = [
+        asyncio.ensure_future(coro)
+        for coro in _bounded_crawls(pool, urls, concurrency, take_screenshot)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer stopped early — don't leave crawls running in the background
+        for task in tasks:
+            task.cancel()
+
+
+# Max simultaneous crawls against one host within a batch — keeps us under
+# most sites' rate limits so we don't pay for 429 retries.
+_PER_HOST_CONCURRENCY = 2
+
+
+def _host_of(url: str) -> str:
+    if not url.startswith(('http://', 'https://')):
+        url = f"https://{url}"
+    return urlparse(url).netloc.lower()
+
+
+def _bounded_crawls(pool: CrawlerPool, urls: list[str], concurrency: int, take_screenshot: bool) -> list:
+    """
+    One crawl coroutine per URL, at most *concurrency* running at once and
+    at most _PER_HOST_CONCURRENCY of those against the same host.
     """
     semaphore = asyncio.Semaphore(concurrency)
+    host_sems: dict[str, asyncio.Semaphore] = {}
     
-    async def crawl_with_semaphore(pool: CrawlerPool, url: str) -> CrawlResult:
-        async with semaphore:
+    async def crawl_with_semaphore(url: str) -> CrawlResult:
+        host_sem = host_sems.setdefault(_host_of(url), asyncio.Semaphore(_PER_HOST_CONCURRENCY))
+        # Host slot first, so URLs queued behind a busy host don't hold a
+        # global slot that another host could be using.
+        async with host_sem, semaphore:
             return await pool.crawl(url, take_screenshot)
     
-    async with CrawlerPool() as pool:
-        tasks = [crawl_with_semaphore(pool, url) for url in urls]
-        return await asyncio.gather(*tasks)
+    return [crawl_with_semaphore(url) for url in urls]
 
 
 # Simple test
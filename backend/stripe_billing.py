@@ -15,14 +15,18 @@ Environment variables:
   FRONTEND_URL           — Base URL for redirect after checkout (e.g. https://app.hunt.so)
 """
 
-import asyncio
+import hashlib
+import hmac
+import json
 import logging
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Optional
 
 import stripe
-from sqlalchemy import select
+from sqlalchemy import bindparam, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import (
@@ -41,6 +45,10 @@ logger = logging.getLogger(__name__)
 # ──────────────────────────────────────────────
 
 stripe.api_key = STRIPE_SECRET_KEY
+# One pooled keep-alive client (httpx, already a dependency) for every Stripe
+# call — repeat calls skip the TCP + TLS handshake. All calls here use the
+# SDK's native *_async methods, so sync requests are left disabled.
+stripe.default_http_client = stripe.HTTPXClient()
 
 # Plan ID → Price ID mapping
 PLAN_PRICE_MAP = {
@@ -51,12 +59,107 @@ PLAN_PRICE_MAP = {
 # Price ID → Plan name (reverse lookup for webhooks)
 PRICE_PLAN_MAP = {v: k for k, v in PLAN_PRICE_MAP.items() if v}
 
+# Redirect targets — fixed for the life of the process
+_CHECKOUT_SUCCESS_URL = f"{FRONTEND_URL}/dashboard?billing=success"
+_CHECKOUT_CANCEL_URL = f"{FRONTEND_URL}/dashboard/settings?billing=cancelled"
+_PORTAL_RETURN_URL = f"{FRONTEND_URL}/dashboard/settings"
+
 
 def is_stripe_configured() -> bool:
     """Check if Stripe is properly configured."""
     return bool(STRIPE_SECRET_KEY and STRIPE_PRO_PRICE_ID)
 
 
+# Subscription ID → (expires_at, status). The dashboard polls billing status,
+# and the status only changes via events we also receive as webhooks — so
+# serve it from memory for a few minutes and evict on every subscription webhook.
+_SUB_STATUS_TTL = 300.0
+_SUB_STATUS_CACHE_SIZE = 1024
+_sub_status_cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+
+def _cached_sub_status(subscription_id: str) -> Optional[str]:
+    entry = _sub_status_cache.get(subscription_id)
+    if entry is None:
+        return None
+    expires_at, status = entry
+    if expires_at <= time.monotonic():
+        del _sub_status_cache[subscription_id]
+        return None
+    return status
+
+
+def _remember_sub_status(subscription_id: str, status: str) -> None:
+    _sub_status_cache[subscription_id] = (time.monotonic() + _SUB_STATUS_TTL, status)
+    _sub_status_cache.move_to_end(subscription_id)
+    if len(_sub_status_cache) > _SUB_STATUS_CACHE_SIZE:
+        _sub_status_cache.popitem(last=False)
+
+
+def _forget_sub_status(subscription_id: Optional[str]) -> None:
+    if subscription_id:
+        _sub_status_cache.pop(subscription_id, None)
+
+
+def _ts_to_dt(ts: int) -> datetime:
+    """Stripe Unix timestamp → aware UTC datetime."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _first_item(sub):
+    """A subscription's first item, or None without items."""
+    items = sub.get("items")
+    data = items.get("data") if items else None
+    return data[0] if data else None
+
+
+def _first_price_id(sub) -> Optional[str]:
+    """Price ID of a subscription's first item ("" if it has no price), None without items."""
+    item = _first_item(sub)
+    if item is None:
+        return None
+    price = item.get("price")
+    return price.get("id", "") if price else ""
+
+
+def _period_values(sub) -> dict:
+    """
+    Profile period columns for whichever timestamps a Stripe subscription carries.
+
+    API versions pinned by stripe>=13 only set current_period_* on the
+    subscription items; the top-level fields of older versions are a fallback.
+    """
+    item = _first_item(sub) or {}
+    values = {}
+    for field, column in (
+        ("current_period_start", "plan_period_start"),
+        ("current_period_end", "plan_period_end"),
+    ):
+        ts = item.get(field) or sub.get(field)
+        if ts:
+            values[column] = _ts_to_dt(ts)
+    return values
+
+
+# Built once; only the bound user ID changes between calls
+_PROFILE_BY_ID = select(Profile).where(Profile.id == bindparam("user_id"))
+
+
+async def _get_profile(db: AsyncSession, user_id: str) -> Optional[Profile]:
+    """Load a user's Profile, or None."""
+    return (await db.execute(_PROFILE_BY_ID, {"user_id": user_id})).scalar_one_or_none()
+
+
+# Billing status reads just these columns — no ORM object to build
+_BILLING_STATUS_BY_ID = select(
+    Profile.plan,
+    Profile.stripe_customer_id,
+    Profile.stripe_subscription_id,
+    Profile.plan_period_start,
+    Profile.plan_period_end,
+).where(Profile.id == bindparam("user_id"))
+
+
 # ──────────────────────────────────────────────
 # Checkout Session
 # ──────────────────────────────────────────────
@@ -76,37 +179,25 @@ async def create_checkout_session(
     if not price_id:
         raise ValueError(f"Unknown plan: {plan}. Must be 'pro' or 'enterprise'.")
 
-    # Get or create Stripe customer
-    profile = (await db.execute(
-        select(Profile).where(Profile.id == user_id)
-    )).scalar_one_or_none()
-
+    # Reuse the Stripe customer if there is one. Otherwise Checkout creates it
+    # (subscription mode always does) and whichever of checkout.session.completed
+    # or customer.subscription.created arrives first saves its ID — the latter
+    # via the user_id in subscription_data.metadata. One Stripe round-trip and
+    # a DB commit fewer than creating it here.
+    profile = await _get_profile(db, user_id)
     customer_id = profile.stripe_customer_id if profile else None
-
-    if not customer_id:
-        # Create a new Stripe customer
-        customer = await asyncio.to_thread(
-            stripe.Customer.create,
-            email=user_email,
-            metadata={"user_id": user_id},
-        )
-        customer_id = customer.id
-
-        # Save customer ID to profile
-        if profile:
-            profile.stripe_customer_id = customer_id
-            await db.commit()
+    customer = {"customer": customer_id} if customer_id else {"customer_email": user_email}
 
     # Create Checkout Session
-    session = await asyncio.to_thread(
-        stripe.checkout.Session.create,
-        customer=customer_id,
+    session = await stripe.checkout.Session.create_async(
+        **customer,
         payment_method_types=["card"],
         mode="subscription",
         line_items=[{"price": price_id, "quantity": 1}],
-        success_url=f"{FRONTEND_URL}/dashboard?billing=success",
-        cancel_url=f"{FRONTEND_URL}/dashboard/settings?billing=cancelled",
+        success_url=_CHECKOUT_SUCCESS_URL,
+        cancel_url=_CHECKOUT_CANCEL_URL,
         metadata={"user_id": user_id, "plan": plan},
+        subscription_data={"metadata": {"user_id": user_id}},
         allow_promotion_codes=True,
         billing_address_collection="auto",
     )
@@ -124,17 +215,14 @@ async def create_portal_session(db: AsyncSession, user_id: str) -> str:
 
     Returns the portal URL.
     """
-    profile = (await db.execute(
-        select(Profile).where(Profile.id == user_id)
-    )).scalar_one_or_none()
+    profile = await _get_profile(db, user_id)
 
     if not profile or not profile.stripe_customer_id:
         raise ValueError("No Stripe customer found. Subscribe to a plan first.")
 
-    session = await asyncio.to_thread(
-        stripe.billing_portal.Session.create,
+    session = await stripe.billing_portal.Session.create_async(
         customer=profile.stripe_customer_id,
-        return_url=f"{FRONTEND_URL}/dashboard/settings",
+        return_url=_PORTAL_RETURN_URL,
     )
 
     return session.url
@@ -157,11 +245,9 @@ async def get_billing_status(db: AsyncSession, user_id: str) -> dict:
             "has_subscription": true/false,
         }
     """
-    profile = (await db.execute(
-        select(Profile).where(Profile.id == user_id)
-    )).scalar_one_or_none()
+    row = (await db.execute(_BILLING_STATUS_BY_ID, {"user_id": user_id})).first()
 
-    if not profile:
+    if row is None:
         return {
             "plan": "free",
             "status": "none",
@@ -170,62 +256,67 @@ async def get_billing_status(db: AsyncSession, user_id: str) -> dict:
             "has_subscription": False,
         }
 
+    billing = {
+        "plan": row.plan,
+        "stripe_customer_id": row.stripe_customer_id,
+        "stripe_subscription_id": row.stripe_subscription_id,
+        "plan_period_start": row.plan_period_start,
+        "plan_period_end": row.plan_period_end,
+    }
+
     # If there's a subscription, check its current status from Stripe
     sub_status = "none"
-    if profile.stripe_subscription_id:
-        try:
-            sub = await asyncio.to_thread(
-                stripe.Subscription.retrieve, profile.stripe_subscription_id
-            )
-            sub_status = sub.status  # active, canceled, past_due, etc.
-        except (stripe.InvalidRequestError, AttributeError, Exception) as e:
-            logger.warning("Could not retrieve subscription %s: %s", profile.stripe_subscription_id, e)
-            sub_status = "expired"
-    elif profile.stripe_customer_id:
+    if billing["stripe_subscription_id"]:
+        subscription_id = billing["stripe_subscription_id"]
+        cached_status = _cached_sub_status(subscription_id)
+        if cached_status is not None:
+            sub_status = cached_status
+        else:
+            try:
+                sub = await stripe.Subscription.retrieve_async(subscription_id)
+                sub_status = sub.status  # active, canceled, past_due, etc.
+                _remember_sub_status(subscription_id, sub_status)
+            except (stripe.InvalidRequestError, AttributeError, Exception) as e:
+                logger.warning("Could not retrieve subscription %s: %s", subscription_id, e)
+                sub_status = "expired"
+    elif billing["stripe_customer_id"]:
         # ── Fallback: webhook may have failed, sync from Stripe directly ──
         try:
-            subs = await asyncio.to_thread(
-                stripe.Subscription.list,
-                customer=profile.stripe_customer_id,
+            subs = await stripe.Subscription.list_async(
+                customer=billing["stripe_customer_id"],
                 status="active",
                 limit=1,
             )
             if subs.data:
-                sub = subs.data[0]
-                sub_status = sub.status
+                # SDK objects aren't dicts; the payload helpers read plain dicts
+                sub = subs.data[0].to_dict()
+                sub_status = sub["status"]
 
                 # Determine plan from price
-                items = sub.get("items", {}).get("data", [])
-                if items:
-                    price_id = items[0].get("price", {}).get("id", "")
-                    plan = PRICE_PLAN_MAP.get(price_id, "pro")
-                else:
-                    plan = "pro"
+                plan = PRICE_PLAN_MAP.get(_first_price_id(sub)) or "pro"
 
                 # Sync to DB (webhook missed this)
-                profile.stripe_subscription_id = sub.id
-                profile.plan = plan
-                profile.plan_tier = plan
-                if sub.get("current_period_start"):
-                    profile.plan_period_start = datetime.fromtimestamp(
-                        sub["current_period_start"], tz=timezone.utc
-                    )
-                if sub.get("current_period_end"):
-                    profile.plan_period_end = datetime.fromtimestamp(
-                        sub["current_period_end"], tz=timezone.utc
-                    )
+                synced = {"stripe_subscription_id": sub["id"], "plan": plan, **_period_values(sub)}
+                await db.execute(
+                    update(Profile)
+                    .where(Profile.id == user_id)
+                    .values(plan_tier=plan, **synced)
+                    .execution_options(synchronize_session=False)
+                )
                 await db.commit()
+                billing.update(synced)
                 logger.info("🔄 Synced missed subscription for user %s: plan=%s", user_id, plan)
         except Exception as e:
             logger.warning("Could not sync subscription from Stripe for user %s: %s", user_id, e)
 
+    period_start, period_end = billing["plan_period_start"], billing["plan_period_end"]
     return {
-        "plan": profile.plan or "free",
-        "status": sub_status if profile.stripe_subscription_id else "none",
-        "period_end": profile.plan_period_end.isoformat() if profile.plan_period_end else None,
-        "period_start": profile.plan_period_start.isoformat() if profile.plan_period_start else None,
-        "stripe_customer_id": profile.stripe_customer_id,
-        "has_subscription": bool(profile.stripe_subscription_id),
+        "plan": billing["plan"] or "free",
+        "status": sub_status if billing["stripe_subscription_id"] else "none",
+        "period_end": period_end.isoformat() if period_end else None,
+        "period_start": period_start.isoformat() if period_start else None,
+        "stripe_customer_id": billing["stripe_customer_id"],
+        "has_subscription": bool(billing["stripe_subscription_id"]),
     }
 
 
@@ -233,6 +324,68 @@ async def get_billing_status(db: AsyncSession, user_id: str) -> dict:
 # Webhook Handler
 # ──────────────────────────────────────────────
 
+# Max age of a signed webhook (same default as stripe.Webhook.construct_event)
+_WEBHOOK_TOLERANCE = 300
+
+# Webhook secret → HMAC already keyed with it; copied for each event
+_HMAC_PROTOTYPES: dict = {}
+
+# Recently handled event IDs → expiry. Stripe delivers at least once and
+# retries for days; a redelivery of an event we've handled is acknowledged
+# without touching the database.
+_SEEN_EVENT_TTL = 86400.0
+_SEEN_EVENTS_SIZE = 4096
+_seen_events: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _seen_event(event_id: str) -> bool:
+    expires_at = _seen_events.get(event_id)
+    if expires_at is None:
+        return False
+    if expires_at <= time.monotonic():
+        del _seen_events[event_id]
+        return False
+    return True
+
+
+def _remember_event(event_id: str) -> None:
+    _seen_events[event_id] = time.monotonic() + _SEEN_EVENT_TTL
+    _seen_events.move_to_end(event_id)
+    if len(_seen_events) > _SEEN_EVENTS_SIZE:
+        _seen_events.popitem(last=False)
+
+
+def _verify_signature(payload: bytes, sig_header: str, secret: str) -> None:
+    """
+    Check a Stripe-Signature header ("t=...,v1=...") against the raw payload.
+    Raises ValueError("Invalid signature") on a mismatch or a stale timestamp.
+    """
+    timestamp = ""
+    signatures = []
+    for item in sig_header.split(","):
+        key, _, value = item.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+
+    if not (secret and timestamp.isdigit() and signatures):
+        raise ValueError("Invalid signature")
+    if int(timestamp) < time.time() - _WEBHOOK_TOLERANCE:
+        raise ValueError("Invalid signature")  # replayed or badly delayed
+
+    prototype = _HMAC_PROTOTYPES.get(secret)
+    if prototype is None:
+        prototype = _HMAC_PROTOTYPES[secret] = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+    mac = prototype.copy()  # keyed state cloned, not re-derived
+    mac.update(timestamp.encode())
+    mac.update(b".")
+    mac.update(payload)  # hashed in place — no concatenated copy of the body
+    expected = mac.hexdigest()
+    if not any(hmac.compare_digest(expected, sig) for sig in signatures):
+        raise ValueError("Invalid signature")
+
+
 async def handle_webhook(payload: bytes, sig_header: str, db: AsyncSession) -> dict:
     """
     Process a Stripe webhook event.
@@ -240,147 +393,198 @@ async def handle_webhook(payload: bytes, sig_header: str, db: AsyncSession) -> d
     Verifies the signature, then dispatches to the appropriate handler.
     Returns a dict with the event type and result.
     """
+    # One HMAC over a few KB — cheaper inline than a thread hop
+    _verify_signature(payload, sig_header, STRIPE_WEBHOOK_SECRET)
     try:
-        event = await asyncio.to_thread(
-            stripe.Webhook.construct_event,
-            payload, sig_header, STRIPE_WEBHOOK_SECRET,
-        )
+        event = json.loads(payload)
     except ValueError:
         raise ValueError("Invalid payload")
-    except stripe.SignatureVerificationError:
-        raise ValueError("Invalid signature")
 
     event_type = event["type"]
+    event_id = event.get("id")
     data = event["data"]["object"]
 
+    if event_id and _seen_event(event_id):
+        logger.debug("Duplicate Stripe webhook %s (%s) — already handled", event_id, event_type)
+        return {"event": event_type, "handled": True, "duplicate": True}
+
     logger.info("Stripe webhook: %s", event_type)
 
-    if event_type == "checkout.session.completed":
-        await _handle_checkout_completed(data, db)
-    elif event_type == "customer.subscription.updated":
-        await _handle_subscription_updated(data, db)
-    elif event_type == "customer.subscription.deleted":
-        await _handle_subscription_deleted(data, db)
-    elif event_type == "invoice.payment_failed":
-        await _handle_payment_failed(data, db)
+    handler = _WEBHOOK_HANDLERS.get(event_type)
+    if handler:
+        await handler(data, db)
     else:
         logger.debug("Unhandled webhook event: %s", event_type)
 
+    # Only once handled — a failed event must still be processed on retry
+    if event_id:
+        _remember_event(event_id)
     return {"event": event_type, "handled": True}
 
 
+async def _update_profile(db: AsyncSession, match, values: dict, *columns) -> tuple:
+    """
+    Apply *values* to the profile matching *match* and commit.
+
+    A single UPDATE ... RETURNING *columns* that only touches the row when some
+    value actually differs, so Stripe's redeliveries don't write (or commit)
+    anything. Returns (row, changed); row is None if no profile matches.
+    """
+    differs = or_(*(getattr(Profile, name).is_distinct_from(value) for name, value in values.items()))
+    row = (await db.execute(
+        update(Profile)
+        .where(match, differs)
+        .values(**values)
+        .returning(*columns)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is not None:
+        await db.commit()
+        return row, True
+    # Nothing written — tell "already up to date" apart from "no such profile"
+    return (await db.execute(select(*columns).where(match))).first(), False
+
+
 async def _handle_checkout_completed(session_data: dict, db: AsyncSession):
     """Handle successful checkout — activate subscription."""
     customer_id = session_data.get("customer")
-    subscription_id = session_data.get("subscription")
+    subscription = session_data.get("subscription")
+    # Webhook payloads carry the subscription ID; a dict only if expanded
+    sub_data = subscription if isinstance(subscription, dict) else None
+    subscription_id = sub_data.get("id") if sub_data else subscription
     user_id = session_data.get("metadata", {}).get("user_id")
     plan = session_data.get("metadata", {}).get("plan", "pro")
+    _forget_sub_status(subscription_id)
 
-    if not user_id:
-        # Try to find user by Stripe customer ID
-        profile = (await db.execute(
-            select(Profile).where(Profile.stripe_customer_id == customer_id)
-        )).scalar_one_or_none()
-        if not profile:
-            logger.error("Checkout completed but no user found for customer %s", customer_id)
-            return
-        user_id = profile.id
-    else:
-        profile = (await db.execute(
-            select(Profile).where(Profile.id == user_id)
-        )).scalar_one_or_none()
-
-    if not profile:
-        logger.error("Profile not found for user %s", user_id)
+    # Never match on a missing key — "stripe_customer_id IS NULL" is every free profile
+    if not (user_id or customer_id):
+        logger.error("Checkout completed without a user ID or customer ID (session %s)", session_data.get("id"))
         return
 
-    # Fetch subscription details for period dates
-    if subscription_id:
+    values = {
+        "stripe_customer_id": customer_id,
+        "stripe_subscription_id": subscription_id,
+        "plan": plan,
+        "plan_tier": plan,  # Keep plan_tier in sync
+    }
+    # Period dates normally come with customer.subscription.created, matched to
+    # the profile by customer ID or by the user_id in the subscription metadata.
+    # Stripe doesn't order events, so if that one hasn't landed yet (no period
+    # on the profile below), fetch the subscription once here.
+    if sub_data:
+        values.update(_period_values(sub_data))
+
+    # Without a user_id in the metadata, find the user by Stripe customer ID
+    match = Profile.id == user_id if user_id else Profile.stripe_customer_id == customer_id
+    row, changed = await _update_profile(db, match, values, Profile.id, Profile.plan_period_end)
+
+    if row is None:
+        if user_id:
+            logger.error("Profile not found for user %s", user_id)
+        else:
+            logger.error("Checkout completed but no user found for customer %s", customer_id)
+        return
+    if sub_data is None and subscription_id and row.plan_period_end is None:
         try:
-            sub = await asyncio.to_thread(
-                stripe.Subscription.retrieve, subscription_id
-            )
-            profile.plan_period_start = datetime.fromtimestamp(
-                sub.current_period_start, tz=timezone.utc
-            )
-            profile.plan_period_end = datetime.fromtimestamp(
-                sub.current_period_end, tz=timezone.utc
-            )
+            sub = await stripe.Subscription.retrieve_async(subscription_id)
         except Exception as e:
-            logger.warning("Could not fetch subscription details: %s", e)
-
-    profile.stripe_customer_id = customer_id
-    profile.stripe_subscription_id = subscription_id
-    profile.plan = plan
-    profile.plan_tier = plan  # Keep plan_tier in sync
+            # The plan is already applied; the period can still come with subscription events
+            logger.warning("Could not retrieve subscription %s for its period: %s", subscription_id, e)
+        else:
+            period = _period_values(sub.to_dict())
+            if period:
+                await _update_profile(db, Profile.id == row.id, period, Profile.id)
+    if not changed:
+        logger.debug("Checkout for user %s already applied (redelivery)", row.id)
+        return
 
-    await db.commit()
-    logger.info("✅ User %s subscribed to %s plan", user_id, plan)
+    logger.info("✅ User %s subscribed to %s plan", row.id, plan)
 
 
 async def _handle_subscription_updated(sub_data: dict, db: AsyncSession):
-    """Handle subscription updates — plan changes, renewals."""
+    """Handle subscription creation and updates — plan changes, renewals."""
     customer_id = sub_data.get("customer")
     subscription_id = sub_data.get("id")
     status = sub_data.get("status")
+    _forget_sub_status(subscription_id)
 
-    profile = (await db.execute(
-        select(Profile).where(Profile.stripe_customer_id == customer_id)
-    )).scalar_one_or_none()
-
-    if not profile:
-        logger.warning("Subscription updated but no profile for customer %s", customer_id)
+    if not customer_id:
+        logger.error("Subscription %s updated without a customer ID", subscription_id)
         return
 
-    profile.stripe_subscription_id = subscription_id
+    values = {"stripe_subscription_id": subscription_id}
 
-    # Determine plan from price ID
-    items = sub_data.get("items", {}).get("data", [])
-    if items:
-        price_id = items[0].get("price", {}).get("id", "")
-        plan = PRICE_PLAN_MAP.get(price_id, profile.plan)
-        profile.plan = plan
-        profile.plan_tier = plan
+    # Determine plan from price ID (unknown price: keep the current plan)
+    price_id = _first_price_id(sub_data)
+    if price_id is not None:
+        plan = PRICE_PLAN_MAP.get(price_id)
+        values["plan"] = plan or Profile.plan
+        values["plan_tier"] = plan or Profile.plan
 
     # Update period dates
-    if sub_data.get("current_period_start"):
-        profile.plan_period_start = datetime.fromtimestamp(
-            sub_data["current_period_start"], tz=timezone.utc
-        )
-    if sub_data.get("current_period_end"):
-        profile.plan_period_end = datetime.fromtimestamp(
-            sub_data["current_period_end"], tz=timezone.utc
-        )
+    values.update(_period_values(sub_data))
 
     # If subscription is canceled or past_due, handle accordingly
     if status in ("canceled", "unpaid"):
-        profile.plan = "free"
-        profile.plan_tier = "free"
+        values["plan"] = "free"
+        values["plan_tier"] = "free"
 
-    await db.commit()
-    logger.info("Subscription updated for customer %s: plan=%s, status=%s", customer_id, profile.plan, status)
+    row, changed = await _update_profile(
+        db, Profile.stripe_customer_id == customer_id, values, Profile.plan,
+    )
+
+    # Stripe doesn't order events: for a first-time subscriber, subscription.created
+    # can arrive before checkout.session.completed has saved the customer ID.
+    # Checkout tags the subscription with our user ID, so link the customer here.
+    user_id = (sub_data.get("metadata") or {}).get("user_id")
+    if row is None and user_id:
+        row, changed = await _update_profile(
+            db,
+            (Profile.id == user_id) & Profile.stripe_customer_id.is_(None),
+            {**values, "stripe_customer_id": customer_id},
+            Profile.plan,
+        )
+
+    if row is None:
+        logger.warning("Subscription updated but no profile for customer %s", customer_id)
+        return
+    if not changed:
+        logger.debug("Subscription update for customer %s already applied (redelivery)", customer_id)
+        return
+
+    logger.info("Subscription updated for customer %s: plan=%s, status=%s", customer_id, row.plan, status)
 
 
 async def _handle_subscription_deleted(sub_data: dict, db: AsyncSession):
     """Handle subscription cancellation — downgrade to free."""
     customer_id = sub_data.get("customer")
+    _forget_sub_status(sub_data.get("id"))
 
-    profile = (await db.execute(
-        select(Profile).where(Profile.stripe_customer_id == customer_id)
-    )).scalar_one_or_none()
+    if not customer_id:
+        logger.error("Subscription %s deleted without a customer ID", sub_data.get("id"))
+        return
+
+    row, changed = await _update_profile(
+        db,
+        Profile.stripe_customer_id == customer_id,
+        {
+            "plan": "free",
+            "plan_tier": "free",
+            "stripe_subscription_id": None,
+            "plan_period_start": None,
+            "plan_period_end": None,
+        },
+        Profile.id,
+    )
 
-    if not profile:
+    if row is None:
         logger.warning("Subscription deleted but no profile for customer %s", customer_id)
         return
+    if not changed:
+        logger.debug("User %s already downgraded (redelivery)", row.id)
+        return
 
-    profile.plan = "free"
-    profile.plan_tier = "free"
-    profile.stripe_subscription_id = None
-    profile.plan_period_start = None
-    profile.plan_period_end = None
-
-    await db.commit()
-    logger.info("⬇️ User %s downgraded to free (subscription deleted)", profile.id)
+    logger.info("⬇️ User %s downgraded to free (subscription deleted)", row.id)
 
 
 async def _handle_payment_failed(invoice_data: dict, db: AsyncSession):
@@ -388,14 +592,31 @@ async def _handle_payment_failed(invoice_data: dict, db: AsyncSession):
     customer_id = invoice_data.get("customer")
     attempt = invoice_data.get("attempt_count", 0)
 
-    profile = (await db.execute(
-        select(Profile).where(Profile.stripe_customer_id == customer_id)
+    if attempt <= 1 or not customer_id:
+        # First failures are routine (expired cards, 3DS) and Stripe retries —
+        # the customer ID is enough; resolve the user only once it repeats.
+        logger.warning("⚠️ Payment failed for customer %s (attempt %d). Stripe will retry.", customer_id, attempt)
+        return
+
+    # Only the ID is logged — don't load the whole profile for it
+    user_id = (await db.execute(
+        select(Profile.id).where(Profile.stripe_customer_id == customer_id)
     )).scalar_one_or_none()
 
-    if profile:
+    if user_id:
         logger.warning(
             "⚠️ Payment failed for user %s (attempt %d). Stripe will retry.",
-            profile.id, attempt,
+            user_id, attempt,
         )
     else:
         logger.warning("Payment failed for unknown customer %s", customer_id)
+
+
+# Event type → handler, looked up by handle_webhook
+_WEBHOOK_HANDLERS = {
+    "checkout.session.completed": _handle_checkout_completed,
+    "customer.subscription.created": _handle_subscription_updated,
+    "customer.subscription.updated": _handle_subscription_updated,
+    "customer.subscription.deleted": _handle_subscription_deleted,
+    "invoice.payment_failed": _handle_payment_failed,
+}
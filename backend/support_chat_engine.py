@@ -14,9 +14,11 @@ import os
 import re
 import uuid
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 from openai import AsyncOpenAI
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -91,6 +93,15 @@ RESTRICTED_CUSTOMER_PATTERNS = (
     r"\bcents?\b",
 )
 
+# Compiled once at import; one alternation means one scan per sentence instead of one per pattern.
+_RESTRICTED_RE = re.compile("(?:" + ")|(?:".join(RESTRICTED_CUSTOMER_PATTERNS) + ")", re.IGNORECASE)
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]")
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+_TOKEN_RE = re.compile(r"[^\W_]{2,}", re.UNICODE)
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+_WS_RE = re.compile(r"\s+")
+
 
 @dataclass
 class RetrievedChunk:
@@ -107,47 +118,74 @@ def _sha256(text: str) -> str:
 
 def _sanitize_question(text: str) -> str:
     clean = (text or "").strip()[:MAX_QUESTION_CHARS]
-    clean = re.sub(r"[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]", "", clean)
-    clean = re.sub(r"<[^>]*>", "", clean)
+    clean = _CONTROL_RE.sub("", clean)
+    clean = _HTML_TAG_RE.sub("", clean)
     return clean
 
 
 def _tokenize(text: str) -> list[str]:
     # Unicode-safe tokenization so non-English queries (e.g. Serbian) still retrieve context.
-    return re.findall(r"[^\W_]{2,}", text.lower(), flags=re.UNICODE)
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _unit(vec) -> np.ndarray:
+    # L2-normalized float32 copy; cosine against other unit vectors is then a plain dot product.
+    arr = np.array(vec, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    if norm > 0:
+        arr /= norm
+    return arr
+
+
+@lru_cache(maxsize=65536)
+def _token_bucket(tok: str, dim: int) -> int:
+    # MD5 keeps buckets stable across processes (hash() is salted per process) and
+    # matches the embeddings already stored in knowledge_chunks; memoized because
+    # token frequencies are heavily skewed.
+    return int.from_bytes(hashlib.md5(tok.encode("utf-8")).digest(), "big") % dim
 
 
-def _hash_embedding(text: str, dim: int = EMBED_DIM) -> list[float]:
-    vec = [0.0] * dim
+def _hash_embedding(text: str, dim: int = EMBED_DIM) -> np.ndarray:
     tokens = _tokenize(text)
     if not tokens:
-        return vec
-    for tok in tokens:
-        idx = int(hashlib.md5(tok.encode("utf-8")).hexdigest(), 16) % dim
-        vec[idx] += 1.0
-    norm = sum(v * v for v in vec) ** 0.5
-    if norm > 0:
-        vec = [v / norm for v in vec]
+        return np.zeros(dim, dtype=np.float32)
+    vec = np.bincount([_token_bucket(tok, dim) for tok in tokens], minlength=dim).astype(np.float32)
+    vec /= np.linalg.norm(vec)
     return vec
 
 
-def _cosine(a: list[float], b: list[float]) -> float:
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = sum(x * y for x, y in zip(a, b))
-    na = sum(x * x for x in a) ** 0.5
-    nb = sum(y * y for y in b) ** 0.5
-    if na == 0 or nb == 0:
-        return 0.0
-    return dot / (na * nb)
+def _unit_rows(embeddings: list[list]) -> np.ndarray:
+    # Stack same-length embeddings into an (N, D) matrix of unit rows (zero rows stay zero).
+    mat = np.array(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    np.divide(mat, norms, out=mat, where=norms > 0)
+    return mat
 
 
-def _keyword_overlap(query: str, chunk: str) -> float:
-    q = set(_tokenize(query))
-    c = set(_tokenize(chunk))
-    if not q or not c:
-        return 0.0
-    return len(q & c) / max(len(q), 1)
+@dataclass
+class _ChunkIndex:
+    """Active chunks as parallel columns, rebuilt only when the active doc set changes."""
+
+    key: frozenset
+    chunk_ids: list[str]
+    titles: list[str]
+    source_paths: list[str]
+    contents: list[str]
+    token_sets: list[frozenset[str]]
+    embeddings: list[Optional[list]]
+    # embedding dim -> (row positions, unit-row matrix); built on first query of that dim
+    matrices: dict[int, tuple[np.ndarray, np.ndarray]]
+
+    def matrix_for(self, dim: int) -> tuple[np.ndarray, np.ndarray]:
+        cached = self.matrices.get(dim)
+        if cached is None:
+            rows = [
+                i for i, emb in enumerate(self.embeddings)
+                if isinstance(emb, list) and len(emb) == dim
+            ]
+            mat = _unit_rows([self.embeddings[i] for i in rows]) if rows else np.zeros((0, dim), dtype=np.float32)
+            cached = self.matrices[dim] = (np.array(rows, dtype=np.intp), mat)
+        return cached
 
 
 def _extract_title(markdown: str, fallback: str) -> str:
@@ -162,7 +200,7 @@ def _chunk_markdown(text: str, target_chars: int = 1000, overlap_chars: int = 18
     text = text.replace("\r\n", "\n").strip()
     if not text:
         return []
-    blocks = [b.strip() for b in re.split(r"\n\s*\n", text) if b.strip()]
+    blocks = [b.strip() for b in _PARAGRAPH_BREAK_RE.split(text) if b.strip()]
     chunks: list[str] = []
     current = ""
 
@@ -241,12 +279,13 @@ class SupportChatEngine:
     def __init__(self):
         self.kimi_client: Optional[AsyncOpenAI] = None
         self._embedding_api_enabled = True
+        self._chunk_index: Optional[_ChunkIndex] = None
         if KIMI_API_KEY:
             self.kimi_client = AsyncOpenAI(api_key=KIMI_API_KEY, base_url=KIMI_API_BASE)
         else:
             logger.warning("Support chat running without KIMI_API_KEY. Falling back to extractive mode.")
 
-    async def _embed_text(self, text: str) -> list[float]:
+    async def _embed_text(self, text: str) -> np.ndarray:
         if self.kimi_client and self._embedding_api_enabled:
             try:
                 resp = await self.kimi_client.embeddings.create(
@@ -255,7 +294,7 @@ class SupportChatEngine:
                 )
                 emb = resp.data[0].embedding  # type: ignore[index]
                 if isinstance(emb, list) and emb:
-                    return [float(x) for x in emb]
+                    return _unit(emb)
             except Exception as exc:
                 self._embedding_api_enabled = False
                 logger.warning("Moonshot embeddings unavailable, falling back to local embeddings: %s", exc)
@@ -339,7 +378,7 @@ class SupportChatEngine:
                     chunk_index=idx,
                     content=chunk,
                     token_estimate=max(1, len(chunk) // 4),
-                    embedding=embedding,
+                    embedding=embedding.tolist(),
                     metadata_json={"source_path": rel},
                 )
                 db.add(kc)
@@ -354,6 +393,7 @@ class SupportChatEngine:
                     archived_docs += 1
 
         await db.commit()
+        self._chunk_index = None
         return {
             "sources_seen": len(paths),
             "indexed_docs": indexed_docs,
@@ -366,34 +406,83 @@ class SupportChatEngine:
         self, db: AsyncSession, question: str, top_k: int = 6
     ) -> list[RetrievedChunk]:
         q_embedding = await self._embed_text(question)
+        index = await self._load_chunk_index(db)
+        n = len(index.chunk_ids)
+        if not n:
+            return []
+
+        # Semantic side: one matrix-vector product over chunks whose embedding
+        # matches the query's dimension; the rest (missing, or from the other
+        # embedder) score 0.
+        sems = np.zeros(n, dtype=np.float32)
+        rows, mat = index.matrix_for(len(q_embedding))
+        if len(rows):
+            sems[rows] = mat @ q_embedding
+
+        # Lexical side: share of question tokens found in each pre-tokenized chunk.
+        q_tokens = frozenset(_tokenize(question))
+        if q_tokens:
+            lex = np.fromiter((len(q_tokens & t) for t in index.token_sets), dtype=np.float32, count=n)
+            lex /= len(q_tokens)
+        else:
+            lex = np.zeros(n, dtype=np.float32)
+
+        scores = 0.82 * sems + 0.18 * lex
+        hits = np.flatnonzero(scores >= 0.08)
+        k = max(1, top_k)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+
+        return [
+            RetrievedChunk(
+                chunk_id=index.chunk_ids[i],
+                title=index.titles[i],
+                source_path=index.source_paths[i],
+                content=index.contents[i],
+                score=float(scores[i]),
+            )
+            for i in hits.tolist()
+        ]
+
+    async def _load_chunk_index(self, db: AsyncSession) -> _ChunkIndex:
+        # Active docs' content hashes identify the indexed corpus: chunks are only
+        # rewritten when a hash changes or a doc is (re)activated or archived, so
+        # this small query is enough to tell whether the cached columns are stale.
+        key = frozenset(
+            (doc_id, content_hash)
+            for doc_id, content_hash in await db.execute(
+                select(KnowledgeDocument.id, KnowledgeDocument.content_hash)
+                .where(KnowledgeDocument.status == "active")
+            )
+        )
+        if self._chunk_index is not None and self._chunk_index.key == key:
+            return self._chunk_index
+
         rows = (
             await db.execute(
-                select(KnowledgeChunk, KnowledgeDocument)
+                select(
+                    KnowledgeChunk.id,
+                    KnowledgeChunk.content,
+                    KnowledgeChunk.embedding,
+                    KnowledgeDocument.title,
+                    KnowledgeDocument.source_path,
+                )
                 .join(KnowledgeDocument, KnowledgeChunk.document_id == KnowledgeDocument.id)
                 .where(KnowledgeDocument.status == "active")
             )
         ).all()
-
-        scored: list[RetrievedChunk] = []
-        for chunk, doc in rows:
-            emb = chunk.embedding if isinstance(chunk.embedding, list) else []
-            sem = _cosine(q_embedding, emb)
-            lex = _keyword_overlap(question, chunk.content)
-            score = 0.82 * sem + 0.18 * lex
-            if score < 0.08:
-                continue
-            scored.append(
-                RetrievedChunk(
-                    chunk_id=chunk.id,
-                    title=doc.title,
-                    source_path=doc.source_path,
-                    content=chunk.content,
-                    score=score,
-                )
-            )
-
-        scored.sort(key=lambda x: x.score, reverse=True)
-        return scored[:max(1, top_k)]
+        self._chunk_index = _ChunkIndex(
+            key=key,
+            chunk_ids=[r.id for r in rows],
+            titles=[r.title for r in rows],
+            source_paths=[r.source_path for r in rows],
+            contents=[r.content for r in rows],
+            token_sets=[frozenset(_tokenize(r.content)) for r in rows],
+            embeddings=[r.embedding for r in rows],
+            matrices={},
+        )
+        return self._chunk_index
 
     async def _generate_answer_with_llm(
         self, question: str, retrieved: list[RetrievedChunk]
@@ -468,18 +557,18 @@ class SupportChatEngine:
         if SupportChatEngine._is_technical_question(question):
             return text
 
-        sentences = re.split(r"(?<=[.!?])\s+", text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         filtered: list[str] = []
         for sentence in sentences:
             s = sentence.strip()
             if not s:
                 continue
-            if any(re.search(pat, s, flags=re.IGNORECASE) for pat in RESTRICTED_CUSTOMER_PATTERNS):
+            if _RESTRICTED_RE.search(s):
                 continue
             filtered.append(s)
 
         cleaned = " ".join(filtered).strip()
-        cleaned = re.sub(r"\s+", " ", cleaned)
+        cleaned = _WS_RE.sub(" ", cleaned)
         if cleaned:
             return cleaned
 
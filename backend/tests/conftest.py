@@ -37,6 +37,11 @@ def _patch_uuid_columns_for_sqlite():
                 col.type = String(36)
 
 
+# Patch before any test module builds ORM expressions — the ORM memoizes
+# annotated columns (with their type) the first time an expression is built.
+_patch_uuid_columns_for_sqlite()
+
+
 @pytest_asyncio.fixture
 async def db_engine():
     """Create a fresh in-memory SQLite engine."""
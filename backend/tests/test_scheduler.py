@@ -0,0 +1,244 @@
+"""
+Tests for scheduler.py
+
+Covers compute_next_run, parse_schedule_config, the atomic schedule
+claim, the re-qualification candidate prefilter and the daily run guard
+(including handing the day back after a failed run).
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select
+
+from db.models import LeadSnapshot, PipelineSchedule, Profile, QualifiedLead, SchedulerState, Search
+from scheduler import (
+    _REQUAL_STATE_KEY,
+    _claim_daily_run,
+    _claim_due_schedules,
+    _requalify_if_due,
+    _stale_hot_leads_exist,
+    compute_next_run,
+    parse_schedule_config,
+)
+
+TEST_USER_PRO = "00000000-0000-4000-8000-000000000002"
+TEST_USER_ENT = "00000000-0000-4000-8000-000000000003"
+
+
+# ═══════════════════════════════════════════════
+# compute_next_run
+# ═══════════════════════════════════════════════
+
+class TestComputeNextRun:
+    BASE = datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+    def test_known_frequencies(self):
+        assert compute_next_run("daily", self.BASE) == self.BASE + timedelta(days=1)
+        assert compute_next_run("biweekly", self.BASE) == self.BASE + timedelta(weeks=2)
+
+    def test_unknown_frequency_defaults_to_weekly(self):
+        assert compute_next_run("hourly", self.BASE) == self.BASE + timedelta(weeks=1)
+
+    def test_defaults_to_now(self):
+        before = datetime.now(timezone.utc)
+        result = compute_next_run("daily")
+        assert result >= before + timedelta(days=1)
+
+
+# ═══════════════════════════════════════════════
+# parse_schedule_config
+# ═══════════════════════════════════════════════
+
+class TestParseScheduleConfig:
+    def test_none_uses_defaults(self):
+        cfg = parse_schedule_config(None)
+        assert cfg.search_ctx == {}
+        assert cfg.mode == "discover"
+        assert cfg.max_leads == 100
+        assert cfg.use_vision is True
+        assert cfg.country_code is None
+        assert cfg.domains == []
+
+    def test_full_config(self):
+        cfg = parse_schedule_config({
+            "search_context": {"industry": "robotics"},
+            "mode": "qualify_only",
+            "options": {"max_leads": 40, "use_vision": False},
+            "country_code": "DE",
+            "domains": ["acme.com"],
+        })
+        assert cfg.search_ctx == {"industry": "robotics"}
+        assert cfg.mode == "qualify_only"
+        assert cfg.max_leads == 40
+        assert cfg.use_vision is False
+        assert cfg.country_code == "DE"
+        assert cfg.domains == ["acme.com"]
+
+    def test_null_options_and_context(self):
+        cfg = parse_schedule_config({"options": None, "search_context": None})
+        assert cfg.search_ctx == {}
+        assert cfg.max_leads == 100
+
+
+# ═══════════════════════════════════════════════
+# _claim_due_schedules
+# ═══════════════════════════════════════════════
+
+def _make_schedule(**overrides) -> PipelineSchedule:
+    defaults = {
+        "user_id": TEST_USER_PRO,
+        "name": "Weekly robotics",
+        "pipeline_config": {},
+        "frequency": "weekly",
+        "is_active": True,
+        "is_running": False,
+        "next_run_at": datetime.now(timezone.utc) - timedelta(minutes=5),
+    }
+    defaults.update(overrides)
+    return PipelineSchedule(**defaults)
+
+
+class TestClaimDueSchedules:
+    async def test_claims_only_due_schedules(self, db_session):
+        now = datetime.now(timezone.utc)
+        due = _make_schedule(name="due")
+        future = _make_schedule(name="future", next_run_at=now + timedelta(hours=1))
+        paused = _make_schedule(name="paused", is_active=False)
+        running = _make_schedule(name="running", is_running=True)
+        db_session.add_all([due, future, paused, running])
+        await db_session.commit()
+
+        claimed = await _claim_due_schedules(db_session, now)
+
+        assert [(r.id, r.name, r.frequency) for r in claimed] == [(due.id, "due", "weekly")]
+        flag = (
+            await db_session.execute(
+                select(PipelineSchedule.is_running).where(PipelineSchedule.id == due.id)
+            )
+        ).scalar_one()
+        assert flag is True
+
+    async def test_second_claim_is_empty(self, db_session):
+        db_session.add(_make_schedule())
+        await db_session.commit()
+        now = datetime.now(timezone.utc)
+
+        assert len(await _claim_due_schedules(db_session, now)) == 1
+        assert await _claim_due_schedules(db_session, now) == []
+
+
+# ═══════════════════════════════════════════════
+# _stale_hot_leads_exist
+# ═══════════════════════════════════════════════
+
+async def _add_lead(db, user_id, tier="hot", status="new", snapshot_age=None) -> QualifiedLead:
+    search = Search(id=str(uuid.uuid4()), user_id=user_id)
+    db.add(search)
+    lead = QualifiedLead(
+        id=str(uuid.uuid4()), search_id=search.id,
+        company_name="Acme", domain="acme.com",
+        website_url="https://acme.com", score=85, tier=tier, status=status,
+    )
+    db.add(lead)
+    if snapshot_age is not None:
+        db.add(LeadSnapshot(
+            lead_id=lead.id, score=85, tier=tier,
+            snapshot_at=datetime.now(timezone.utc) - snapshot_age,
+        ))
+    await db.commit()
+    return lead
+
+
+async def _candidate_ids(db) -> set[str]:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+    rows = await db.execute(select(Profile.id).where(_stale_hot_leads_exist(cutoff)))
+    return set(rows.scalars().all())
+
+
+class TestStaleHotLeadsExist:
+    async def test_never_snapshotted_hot_lead(self, db_session):
+        await _add_lead(db_session, TEST_USER_PRO)
+        assert await _candidate_ids(db_session) == {TEST_USER_PRO}
+
+    async def test_old_snapshot_is_stale(self, db_session):
+        await _add_lead(db_session, TEST_USER_ENT, snapshot_age=timedelta(days=45))
+        assert await _candidate_ids(db_session) == {TEST_USER_ENT}
+
+    async def test_recent_snapshot_excluded(self, db_session):
+        await _add_lead(db_session, TEST_USER_PRO, snapshot_age=timedelta(days=2))
+        assert await _candidate_ids(db_session) == set()
+
+    async def test_closed_or_non_hot_excluded(self, db_session):
+        await _add_lead(db_session, TEST_USER_PRO, status="won")
+        await _add_lead(db_session, TEST_USER_PRO, tier="review")
+        assert await _candidate_ids(db_session) == set()
+
+
+# ═══════════════════════════════════════════════
+# _claim_daily_run
+# ═══════════════════════════════════════════════
+
+class TestClaimDailyRun:
+    async def test_first_claim_wins(self, db_session):
+        assert await _claim_daily_run(db_session, "requal", "2025-03-01") is True
+        assert await _claim_daily_run(db_session, "requal", "2025-03-01") is False
+
+    async def test_next_day_claims_again(self, db_session):
+        assert await _claim_daily_run(db_session, "requal", "2025-03-01") is True
+        assert await _claim_daily_run(db_session, "requal", "2025-03-02") is True
+
+    async def test_older_date_never_claims(self, db_session):
+        assert await _claim_daily_run(db_session, "requal", "2025-03-02") is True
+        assert await _claim_daily_run(db_session, "requal", "2025-03-01") is False
+
+
+# ═══════════════════════════════════════════════
+# _requalify_if_due
+# ═══════════════════════════════════════════════
+
+def _session_factory(db):
+    @asynccontextmanager
+    async def factory():
+        yield db
+    return factory
+
+
+async def _stored_date(db):
+    return (await db.execute(
+        select(SchedulerState.value).where(SchedulerState.key == _REQUAL_STATE_KEY)
+    )).scalar_one_or_none()
+
+
+class TestRequalifyIfDue:
+    async def test_runs_once_per_day(self, db_session):
+        run = AsyncMock()
+        with patch("scheduler.async_session", _session_factory(db_session)), \
+                patch("scheduler._run_daily_requalification", run):
+            assert await _requalify_if_due("2025-03-01") is True
+            assert await _requalify_if_due("2025-03-01") is False
+        run.assert_awaited_once()
+        assert await _stored_date(db_session) == "2025-03-01"
+
+    async def test_failed_run_leaves_day_unclaimed(self, db_session):
+        await _claim_daily_run(db_session, _REQUAL_STATE_KEY, "2025-02-28")
+        failing = AsyncMock(side_effect=RuntimeError("boom"))
+        with patch("scheduler.async_session", _session_factory(db_session)), \
+                patch("scheduler._run_daily_requalification", failing):
+            with pytest.raises(RuntimeError):
+                await _requalify_if_due("2025-03-01")
+
+        assert await _stored_date(db_session) == "2025-02-28"
+        assert await _claim_daily_run(db_session, _REQUAL_STATE_KEY, "2025-03-01") is True
+
+    async def test_failed_first_run_removes_claim(self, db_session):
+        failing = AsyncMock(side_effect=RuntimeError("boom"))
+        with patch("scheduler.async_session", _session_factory(db_session)), \
+                patch("scheduler._run_daily_requalification", failing):
+            with pytest.raises(RuntimeError):
+                await _requalify_if_due("2025-03-01")
+
+        assert await _stored_date(db_session) is None
@@ -33,11 +33,48 @@ class TestTruncateToTokens:
         result = truncate_to_tokens(text, 50)
         assert result.rstrip().endswith(".") or "[Content truncated" in result
 
+    def test_ignores_period_before_window_tail(self):
+        from scraper import truncate_to_tokens
+        text = "Intro." + "x" * 1000
+        result = truncate_to_tokens(text, 100)
+        assert result.startswith("Intro." + "x" * 394)
+
+    def test_breaks_at_last_period_in_tail(self):
+        from scraper import truncate_to_tokens
+        text = "x" * 350 + "." + "y" * 200
+        result = truncate_to_tokens(text, 100)
+        assert result == "x" * 350 + ".\n\n[Content truncated for processing...]"
+
     def test_zero_tokens_gives_truncated(self):
         from scraper import truncate_to_tokens
         result = truncate_to_tokens("Hello world.", 0)
         assert "[Content truncated" in result
 
+    def test_sectioned_text_keeps_short_trailing_section(self):
+        from scraper import truncate_to_tokens
+        text = (
+            "# About us\n" + "We build motors. " * 300 + "\n"
+            "## Products\n" + "Servo drives and gearboxes. " * 200 + "\n"
+            "## Contact\nsales@acme.example, +49 30 1234\n"
+        )
+        result = truncate_to_tokens(text, 500)
+        assert "## Contact\nsales@acme.example, +49 30 1234" in result
+        assert "## Products" in result
+        assert result.endswith("[Content truncated for processing...]")
+        assert len(result) <= 2000 + len("\n\n[Content truncated for processing...]")
+
+    def test_fit_sections_caps_longest_sections_evenly(self):
+        from scraper import _fit_sections
+        text = "# A\n" + "a" * 1000 + "\n# B\n" + "b" * 1000 + "\n# C\nshort\n"
+        result = _fit_sections(text, 900)
+        assert len(result) <= 900
+        assert "# C\nshort" in result
+        assert abs(result.count("a") - result.count("b")) <= 2
+
+    def test_fit_sections_none_without_headings(self):
+        from scraper import _fit_sections
+        assert _fit_sections("plain text " * 100, 100) is None
+
     def test_exact_boundary(self):
         from scraper import truncate_to_tokens
         text = "x" * 400  # 400 chars = ~100 tokens
@@ -45,6 +82,26 @@ class TestTruncateToTokens:
         assert result == text  # Should fit exactly
 
 
+# ═══════════════════════════════════════════════
+# _backoff
+# ═══════════════════════════════════════════════
+
+class TestBackoff:
+    def test_exponential_with_jitter(self):
+        from scraper import _backoff
+        for attempt, nominal in [(1, 1.0), (2, 2.0), (3, 4.0)]:
+            for _ in range(50):
+                assert nominal * 0.75 <= _backoff(attempt) <= nominal * 1.25
+
+    def test_capped(self):
+        from scraper import _backoff
+        assert _backoff(20, base=1.0, cap=30.0) <= 30.0 * 1.25
+
+    def test_keepalive_outlives_longest_retry_sleep(self):
+        from scraper import _BACKOFF_CAP, _HTTPX_LIMITS
+        assert _BACKOFF_CAP * 1.25 < _HTTPX_LIMITS.keepalive_expiry
+
+
 # ═══════════════════════════════════════════════
 # _html_to_markdown
 # ═══════════════════════════════════════════════
@@ -53,8 +110,6 @@ class TestHtmlToMarkdown:
     def test_heading_conversion(self):
         from scraper import _html_to_markdown
         result = _html_to_markdown("<h1>Title</h1>")
-        # The regex removes </h1> first as a block element, so the heading regex
-        # doesn't match. The function still extracts the text content.
         assert "Title" in result
 
     def test_heading_h2(self):
@@ -101,12 +156,95 @@ class TestHtmlToMarkdown:
         result = _html_to_markdown("Just plain text")
         assert result == "Just plain text"
 
+    def test_nested_link_text(self):
+        from scraper import _html_to_markdown
+        result = _html_to_markdown('<a href="/team">Our <b>team</b></a>')
+        assert "[Our team](/team)" in result
+
+
+class TestHtmlToMarkdownRegex:
+    """The no-dependency fallback used when selectolax isn't installed."""
+
+    def test_strips_script_tags(self):
+        from scraper import _html_to_markdown_regex
+        result = _html_to_markdown_regex("<p>Hello</p><script>alert('xss')</script><p>World</p>")
+        assert "alert" not in result
+        assert "Hello" in result and "World" in result
+
+    def test_link_conversion(self):
+        from scraper import _html_to_markdown_regex
+        result = _html_to_markdown_regex('<a href="https://example.com">Click here</a>')
+        assert "[Click here](https://example.com)" in result
+
+    def test_list_items(self):
+        from scraper import _html_to_markdown_regex
+        result = _html_to_markdown_regex("<ul><li>Item 1</li><li>Item 2</li></ul>")
+        assert "- Item 1" in result
+        assert "- Item 2" in result
+
+    def test_headings_on_own_lines(self):
+        from scraper import _html_to_markdown_regex
+        result = _html_to_markdown_regex('<p>Intro</p><h2 class="t">About <b>us</b></h2><p>Body</p>')
+        assert result == "Intro\n\n## About us\nBody"
+
+    def test_link_inside_heading(self):
+        from scraper import _html_to_markdown_regex
+        assert _html_to_markdown_regex('<h3><a href="/contact">Contact</a></h3>') == "### [Contact](/contact)"
+
+    def test_link_tag_is_not_a_list_item(self):
+        from scraper import _html_to_markdown_regex
+        assert _html_to_markdown_regex('<link rel="stylesheet" href="a.css"><p>Text</p>') == "Text"
+
+    def test_html_entities(self):
+        from scraper import _html_to_markdown_regex
+        assert _html_to_markdown_regex("&amp; &lt; &gt; &quot; &#39;") == "& < > \" '"
+
+    def test_numeric_and_named_entities(self):
+        from scraper import _html_to_markdown_regex
+        assert _html_to_markdown_regex("It&#8217;s&nbsp;&rsquo;ok") == "It\u2019s \u2019ok"
+
+
+class TestStripCodeBlocks:
+    def test_removes_all_code_elements_case_insensitively(self):
+        from scraper import _strip_code_blocks
+        html = "a<SCRIPT type=x>1</script>b<style>p{}</STYLE>c<noscript>n</noscript>d"
+        assert _strip_code_blocks(html) == "abcd"
+
+    def test_ignores_longer_tag_names(self):
+        from scraper import _strip_code_blocks
+        assert _strip_code_blocks("<styles>keep</styles>") == "<styles>keep</styles>"
+
+    def test_unclosed_block_left_in_place(self):
+        from scraper import _strip_code_blocks
+        html = "x<script>1</script>y<script>never closed"
+        assert _strip_code_blocks(html) == "xy<script>never closed"
+
+    def test_offsets_survive_length_changing_lowercase(self):
+        from scraper import _strip_code_blocks
+        # "İ".lower() is two code points — must not shift the cut positions
+        assert _strip_code_blocks("İİ<script>x</script>ok") == "İİok"
+
+    def test_linear_on_many_unclosed_tags(self):
+        import time
+        from scraper import _strip_code_blocks
+        html = "<script>" * 50_000
+        start = time.perf_counter()
+        assert _strip_code_blocks(html) == html
+        assert time.perf_counter() - start < 1.0
+
 
 # ═══════════════════════════════════════════════
 # resize_screenshot
 # ═══════════════════════════════════════════════
 
 class TestResizeScreenshot:
+    @pytest.fixture(autouse=True)
+    def _empty_cache(self):
+        import scraper
+        scraper._RESIZE_CACHE.clear()
+        yield
+        scraper._RESIZE_CACHE.clear()
+
     def test_returns_string(self):
         from scraper import resize_screenshot
         # Create a minimal 1x1 PNG as base64
@@ -123,11 +261,162 @@ class TestResizeScreenshot:
         except ImportError:
             pytest.skip("PIL not available")
 
+    def test_jpeg_source_resized_to_target(self):
+        import io
+        from PIL import Image
+        from scraper import resize_screenshot
+        img = Image.new("RGB", (1440, 900), "blue")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG")
+        b64 = base64.b64encode(buf.getvalue()).decode()
+
+        with Image.open(io.BytesIO(base64.b64decode(resize_screenshot(b64, target_width=180)))) as out:
+            assert out.width == 180
+            assert abs(out.height - 112) <= 1
+            assert out.format == "JPEG"
+
+    def test_does_not_upscale(self):
+        import io
+        from PIL import Image
+        from scraper import resize_screenshot
+        img = Image.new("RGB", (400, 300), "green")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        b64 = base64.b64encode(buf.getvalue()).decode()
+
+        with Image.open(io.BytesIO(base64.b64decode(resize_screenshot(b64, target_width=720)))) as out:
+            assert out.size == (400, 300)
+
+    def test_uses_turbojpeg_when_available(self):
+        import io
+        import scraper
+        from PIL import Image
+        img = Image.new("RGBA", (100, 60), "red")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        b64 = base64.b64encode(buf.getvalue()).decode()
+
+        fake_tj = MagicMock()
+        fake_tj.encode.return_value = b"\xff\xd8jpeg"
+        with patch.object(scraper, "_TURBOJPEG", fake_tj), \
+                patch.object(scraper, "TJPF_RGB", 0, create=True), \
+                patch.object(scraper, "TJSAMP_420", 2, create=True), \
+                patch.object(scraper, "TJFLAG_PROGRESSIVE", 16384, create=True):
+            result = scraper.resize_screenshot(b64, target_width=50)
+
+        assert base64.b64decode(result) == b"\xff\xd8jpeg"
+        pixels = fake_tj.encode.call_args[0][0]
+        assert pixels.shape == (30, 50, 3)
+
+    def test_pil_encoder_writes_progressive_420(self):
+        import io
+        from PIL import Image, JpegImagePlugin
+        import scraper
+        img = Image.new("RGB", (200, 100), "purple")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+
+        with patch.object(scraper, "_TURBOJPEG", None):
+            result = scraper.resize_screenshot_bytes(buf.getvalue(), target_width=100)
+        with Image.open(io.BytesIO(result)) as out:
+            assert out.info.get("progressive") == 1
+            assert JpegImagePlugin.get_sampling(out) == 2
+
+    def test_prepare_screenshot_accepts_str_and_bytes(self):
+        import io
+        from PIL import Image
+        from scraper import _prepare_screenshot
+        img = Image.new("RGB", (100, 50), "red")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        raw = buf.getvalue()
+
+        for source in (raw, base64.b64encode(raw).decode()):
+            with Image.open(io.BytesIO(base64.b64decode(_prepare_screenshot(source)))) as out:
+                assert out.format == "JPEG"
+
+    def test_repeat_calls_served_from_cache(self):
+        import io
+        from PIL import Image
+        import scraper
+        img = Image.new("RGB", (100, 50), "red")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        b64 = base64.b64encode(buf.getvalue()).decode()
+
+        with patch.object(scraper, "resize_screenshot_bytes", wraps=scraper.resize_screenshot_bytes) as spy:
+            first = scraper.resize_screenshot(b64, target_width=50)
+            second = scraper.resize_screenshot(b64, target_width=50)
+            scraper.resize_screenshot(b64, target_width=40)
+
+        assert first == second
+        assert spy.call_count == 2  # second call hit the cache; new width missed
+
+    def test_cache_is_bounded(self):
+        import io
+        from PIL import Image
+        import scraper
+        with patch.object(scraper, "_RESIZE_CACHE_SIZE", 2):
+            for colour in ("red", "green", "blue"):
+                buf = io.BytesIO()
+                Image.new("RGB", (20, 20), colour).save(buf, format="PNG")
+                scraper.resize_screenshot(base64.b64encode(buf.getvalue()).decode(), target_width=10)
+        assert len(scraper._RESIZE_CACHE) == 2
+
+    @pytest.mark.parametrize("fmt", ["PNG", "JPEG"])
+    def test_crops_full_page_capture_to_max_aspect(self, fmt):
+        import io
+        from PIL import Image
+        from scraper import resize_screenshot_bytes
+        img = Image.new("RGB", (800, 4000), "white")
+        img.paste((255, 0, 0), (0, 0, 800, 450))  # red "above the fold" band
+        buf = io.BytesIO()
+        img.save(buf, format=fmt)
+
+        result = resize_screenshot_bytes(buf.getvalue(), target_width=160, max_aspect=0.5625)
+        with Image.open(io.BytesIO(result)) as out:
+            assert out.width == 160
+            assert abs(out.height - 90) <= 1
+            r, g, b = out.convert("RGB").getpixel((80, 45))
+            assert r > 200 and g < 60
+
     def test_handles_invalid_base64(self):
         from scraper import resize_screenshot
         result = resize_screenshot("not-valid-base64")
         assert result == "not-valid-base64"  # Should return original on failure
 
+    def test_bytes_variant_returns_jpeg_bytes(self):
+        import io
+        from PIL import Image
+        from scraper import resize_screenshot_bytes
+        img = Image.new("RGB", (400, 200), "red")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+
+        result = resize_screenshot_bytes(buf.getvalue(), target_width=100)
+        with Image.open(io.BytesIO(result)) as out:
+            assert out.format == "JPEG"
+            assert out.size == (100, 50)
+
+    def test_small_jpeg_passed_through(self):
+        import io
+        from PIL import Image
+        from scraper import resize_screenshot, resize_screenshot_bytes
+        buf = io.BytesIO()
+        Image.new("RGB", (640, 360), "navy").save(buf, format="JPEG")
+        data = buf.getvalue()
+
+        assert resize_screenshot_bytes(data, target_width=720) is data
+        b64 = base64.b64encode(data).decode()
+        assert resize_screenshot(b64, target_width=720) == b64
+        # Too wide, or too tall for the aspect budget → re-encoded
+        assert resize_screenshot_bytes(data, target_width=320) is not data
+        assert resize_screenshot_bytes(data, target_width=720, max_aspect=0.5) is not data
+
+    def test_bytes_variant_returns_input_on_failure(self):
+        from scraper import resize_screenshot_bytes
+        assert resize_screenshot_bytes(b"not an image") == b"not an image"
+
 
 # ═══════════════════════════════════════════════
 # CrawlerPool lifecycle
@@ -152,6 +441,251 @@ class TestCrawlerPool:
         assert pool._httpx_client is None
 
 
+class TestPoolResultCache:
+    @staticmethod
+    def _pool(status=200):
+        import httpx
+        from scraper import CrawlerPool
+
+        requested: list[str] = []
+
+        async def handler(request):
+            import asyncio
+            requested.append(str(request.url))
+            await asyncio.sleep(0.01)
+            return httpx.Response(status, html="<title>Acme</title><p>Hello</p>")
+
+        pool = CrawlerPool()
+        pool._httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return pool, requested
+
+    @pytest.mark.asyncio
+    async def test_duplicate_urls_crawled_once(self):
+        import asyncio
+        pool, requested = self._pool()
+        with patch("scraper._HAS_CRAWL4AI", False):
+            results = await asyncio.gather(
+                pool.crawl("https://Acme.example/about/", False),
+                pool.crawl("acme.example/about#team", False),
+            )
+            again = await pool.crawl("https://acme.example/about", False)
+        await pool._httpx_client.aclose()
+
+        assert len(requested) == 1
+        assert all(r.success for r in results) and again is results[0]
+
+    @pytest.mark.asyncio
+    async def test_failures_not_cached(self):
+        pool, requested = self._pool(status=404)
+        with patch("scraper._HAS_CRAWL4AI", False):
+            await pool.crawl("https://acme.example/missing", False)
+            await pool.crawl("https://acme.example/missing", False)
+        await pool._httpx_client.aclose()
+        assert len(requested) == 2
+
+    @pytest.mark.asyncio
+    async def test_crawl_cancelled_with_its_last_waiter(self):
+        import asyncio
+        from scraper import CrawlerPool
+
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def slow_crawl(url, take_screenshot):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        pool = CrawlerPool()
+        with patch.object(pool, "_crawl_uncached", side_effect=slow_crawl):
+            first = asyncio.ensure_future(pool.crawl("https://acme.example", False))
+            second = asyncio.ensure_future(pool.crawl("https://acme.example", False))
+            await started.wait()
+
+            first.cancel()
+            await asyncio.sleep(0)
+            assert not cancelled.is_set()  # still awaited by the second caller
+
+            second.cancel()
+            await asyncio.wait_for(cancelled.wait(), 1)
+            await asyncio.gather(first, second, return_exceptions=True)
+
+        assert pool._pending == {} and pool._waiters == {}
+
+    @pytest.mark.asyncio
+    async def test_screenshots_not_memoized(self):
+        from models import CrawlResult
+        from scraper import CrawlerPool
+
+        crawl = AsyncMock(return_value=CrawlResult(
+            url="https://acme.example", success=True, markdown_content="Hi", screenshot_base64="x" * 1000,
+        ))
+        pool = CrawlerPool()
+        with patch.object(pool, "_crawl_uncached", crawl):
+            first = await pool.crawl("https://acme.example", True)
+            text_only = await pool.crawl("https://acme.example", False)
+            await pool.crawl("https://acme.example", True)
+
+        assert first.screenshot_base64  # the caller still gets its screenshot
+        assert text_only.markdown_content == "Hi" and text_only.screenshot_base64 is None
+        assert crawl.await_count == 2  # text served from memory, screenshot re-crawled
+        assert all(r.screenshot_base64 is None for _, r in pool._recent.values())
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_swept_on_insert(self):
+        from models import CrawlResult
+        from scraper import CrawlerPool
+
+        async def crawl(url, take_screenshot):
+            return CrawlResult(url=url, success=True)
+
+        pool = CrawlerPool()
+        with patch.object(pool, "_crawl_uncached", side_effect=crawl), \
+             patch("scraper.time.monotonic", return_value=1000.0):
+            await pool.crawl("https://a.example", False)
+        with patch.object(pool, "_crawl_uncached", side_effect=crawl), \
+             patch("scraper.time.monotonic", return_value=1000.0 + 601):
+            await pool.crawl("https://b.example", False)
+
+        assert [k[0] for k in pool._recent] == ["https://b.example"]
+
+    def test_normalize_url(self):
+        from scraper import _normalize_url
+        assert _normalize_url("Acme.EXAMPLE/") == "https://acme.example"
+        assert _normalize_url("http://acme.example/a/?q=1#x") == "http://acme.example/a?q=1"
+
+
+class TestBrowserRecycling:
+    @pytest.mark.asyncio
+    async def test_restarts_browser_after_limit_without_interrupting_crawls(self):
+        import asyncio
+        import scraper
+        from models import CrawlResult
+
+        browsers = []
+
+        def make_browser(config=None):
+            browser = MagicMock()
+            browser.__aenter__ = AsyncMock(return_value=browser)
+            browser.__aexit__ = AsyncMock()
+            browsers.append(browser)
+            return browser
+
+        used_by = []
+
+        async def fake_do_crawl(url, take_screenshot, crawler, **kwargs):
+            used_by.append(crawler)
+            await asyncio.sleep(0.01)
+            assert not crawler.__aexit__.await_count  # never closed mid-crawl
+            return CrawlResult(url=url, success=True)
+
+        with patch.object(scraper, "_load_crawl4ai", return_value=True), \
+             patch.object(scraper, "AsyncWebCrawler", side_effect=make_browser), \
+             patch.object(scraper, "_do_crawl", side_effect=fake_do_crawl), \
+             patch.object(scraper, "_BROWSER_RECYCLE_PAGES", 3):
+            async with scraper.CrawlerPool() as pool:
+                await asyncio.gather(*(pool.crawl(f"https://x{i}.example") for i in range(7)))
+
+        assert len(browsers) == 3
+        assert used_by.count(browsers[0]) == 3
+        assert used_by.count(browsers[1]) == 3
+        assert browsers[0].__aexit__.await_count == 1
+
+
+class TestGlobalPool:
+    @pytest.mark.asyncio
+    async def test_reused_across_calls(self):
+        import scraper
+        with patch.object(scraper.CrawlerPool, "__aenter__", new=AsyncMock()) as enter, \
+             patch.object(scraper.CrawlerPool, "__aexit__", new=AsyncMock()) as exit_:
+            first = await scraper.get_global_pool()
+            second = await scraper.get_global_pool()
+            assert first is second
+            assert enter.await_count == 1
+
+            await scraper.close_global_pool()
+            assert exit_.await_count == 1
+            assert scraper._GLOBAL_POOL is None
+
+
+class TestSharedClient:
+    @pytest.mark.asyncio
+    async def test_reused_and_closed_on_shutdown(self):
+        import scraper
+        client = scraper.get_shared_client()
+        assert scraper.get_shared_client() is client
+
+        with patch.object(scraper, "_HAS_CRAWL4AI", False):
+            async with scraper.CrawlerPool() as pool:
+                assert pool._httpx_client is client
+        assert not client.is_closed  # pools borrow the client, they don't own it
+
+        await scraper.close_global_pool()
+        assert client.is_closed
+        assert scraper.get_shared_client() is not client
+        await scraper.close_global_pool()
+
+
+class TestBatchCrawl:
+    @staticmethod
+    def _fake_pool(delays: dict):
+        import asyncio
+        from models import CrawlResult
+
+        async def crawl(url, take_screenshot=True):
+            await asyncio.sleep(delays[url])
+            return CrawlResult(url=url, success=True)
+
+        pool = MagicMock()
+        pool.crawl = crawl
+        return pool
+
+    @pytest.mark.asyncio
+    async def test_batch_crawl_keeps_input_order(self):
+        import scraper
+        pool = self._fake_pool({"a": 0.03, "b": 0.0, "c": 0.01})
+        with patch.object(scraper, "get_global_pool", new=AsyncMock(return_value=pool)):
+            results = await scraper.batch_crawl(["a", "b", "c"])
+        assert [r.url for r in results] == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrency_per_host(self):
+        import asyncio
+        import scraper
+        from models import CrawlResult
+
+        active: dict[str, int] = {}
+        peak: dict[str, int] = {}
+
+        async def crawl(url, take_screenshot=True):
+            host = scraper._host_of(url)
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+            await asyncio.sleep(0.01)
+            active[host] -= 1
+            return CrawlResult(url=url, success=True)
+
+        pool = MagicMock()
+        pool.crawl = crawl
+        urls = [f"https://same.com/p{i}" for i in range(6)] + ["other.com", "third.com"]
+        with patch.object(scraper, "get_global_pool", new=AsyncMock(return_value=pool)):
+            results = await scraper.batch_crawl(urls, concurrency=5)
+
+        assert len(results) == 8
+        assert peak["same.com"] == scraper._PER_HOST_CONCURRENCY
+        assert peak["other.com"] == 1
+
+    @pytest.mark.asyncio
+    async def test_iter_yields_in_completion_order(self):
+        import scraper
+        pool = self._fake_pool({"a": 0.03, "b": 0.0, "c": 0.01})
+        with patch.object(scraper, "get_global_pool", new=AsyncMock(return_value=pool)):
+            urls = [r.url async for r in scraper.batch_crawl_iter(["a", "b", "c"])]
+        assert urls == ["b", "c", "a"]
+
+
 # ═══════════════════════════════════════════════
 # _clean_page_content
 # ═══════════════════════════════════════════════
@@ -189,6 +723,16 @@ class TestCleanPageContent:
         assert _clean_page_content("") is None
         assert _clean_page_content("ab") is None
 
+    def test_truncation_keeps_trailing_contact_section(self):
+        from scraper import _clean_page_content
+        content = (
+            "# About\n" + "Founded in 1990, we build precision motors for robots.\n" * 150
+            + "# Contact\nJane Doe, Head of Sales, jane@acme.example\n"
+        )
+        result = _clean_page_content(content)
+        assert "jane@acme.example" in result
+        assert len(result) <= 4000 + len("\n[truncated]")
+
     def test_truncates_long_content(self):
         from scraper import _clean_page_content
         content = "Valid line content here\n" * 500
@@ -196,6 +740,34 @@ class TestCleanPageContent:
         assert result is not None
         assert len(result) <= 4100  # 4000 + "[truncated]"
 
+    @pytest.mark.parametrize("line", [
+        "MENU",
+        "Skip to content",
+        "| Facebook |",
+        "***",
+        "![logo](https://example.com/logo.png)",
+        "## Cookie settings",
+        "[Read More](https://example.com/news)",
+        "Instagram",
+        "*" * 40,
+        "|      Pinterest      |",
+        "© 2024 Acme Industrial Automation GmbH — all rights reserved",
+    ])
+    def test_skips_boilerplate_lines(self, line):
+        from scraper import _clean_page_content
+        keep = "Our engineering team designs custom brushless motors in Munich."
+        assert _clean_page_content(f"{line}\n{keep}") == keep
+
+    def test_prefilter_never_hides_a_regex_match(self):
+        import random
+        from scraper import _SKIP_RE, _may_be_boilerplate
+        rng = random.Random(0)
+        alphabet = "ab ©|[]()#*!.:/MENUReadmoreFacebook"
+        for _ in range(20000):
+            line = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 40))).strip()
+            if line and _SKIP_RE.search(line):
+                assert _may_be_boilerplate(line), line
+
 
 # ═══════════════════════════════════════════════
 # crawl_company
@@ -205,19 +777,209 @@ class TestCrawlCompany:
     @pytest.mark.asyncio
     async def test_prepends_https(self):
         """When URL has no scheme, should prepend https://."""
+        import httpx
         from scraper import CrawlerPool
 
-        pool = CrawlerPool()
-        # Mock the internal httpx client
-        mock_resp = AsyncMock()
-        mock_resp.status_code = 200
-        mock_resp.text = "<html><head><title>Test</title></head><body>Hello World</body></html>"
-        mock_resp.raise_for_status = MagicMock()
+        requested: list[str] = []
 
-        pool._httpx_client = AsyncMock()
-        pool._httpx_client.get = AsyncMock(return_value=mock_resp)
+        def handler(request):
+            requested.append(str(request.url))
+            return httpx.Response(
+                200, html="<html><head><title>Test</title></head><body>Hello World</body></html>"
+            )
+
+        pool = CrawlerPool()
+        pool._httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
 
         result = await pool.crawl("example.com", take_screenshot=False)
         # The URL passed to httpx should have https:// prepended
-        call_url = pool._httpx_client.get.call_args[0][0]
-        assert call_url.startswith("https://")
+        assert requested[0].startswith("https://")
+        assert result.success
+        assert result.title == "Test"
+        await pool._httpx_client.aclose()
+
+
+class TestCrawlContactPages:
+    @staticmethod
+    def _pool(pages: dict):
+        import httpx
+        from scraper import CrawlerPool
+
+        requested: list[str] = []
+
+        def handler(request):
+            requested.append(request.url.path)
+            page = pages.get(request.url.path)
+            if page is None:
+                return httpx.Response(404)
+            if page.startswith("/"):
+                return httpx.Response(301, headers={"Location": page})
+            return httpx.Response(200, html=f"<p>{page}</p>")
+
+        pool = CrawlerPool()
+        pool._httpx_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), follow_redirects=True,
+        )
+        return pool, requested
+
+    @pytest.mark.asyncio
+    async def test_snippets_keep_path_priority_order(self):
+        pool, _ = self._pool({
+            "/impressum": "Managing director Jane Doe, jane@acme.example, Berlin",
+            "/contact": "Contact our sales team at sales@acme.example or +49 30 1234",
+        })
+        with patch("scraper._HAS_CRAWL4AI", False):
+            result = await pool.crawl_contact_pages("acme.example")
+        await pool._httpx_client.aclose()
+
+        assert result.index("/contact page") < result.index("/impressum page")
+
+    @pytest.mark.asyncio
+    async def test_returns_none_when_nothing_found(self):
+        pool, requested = self._pool({})
+        with patch("scraper._HAS_CRAWL4AI", False):
+            assert await pool.crawl_contact_pages("https://acme.example/products") is None
+        await pool._httpx_client.aclose()
+        assert len(requested) == 8
+
+    @pytest.mark.asyncio
+    async def test_redirect_aliases_kept_once(self):
+        pool, _ = self._pool({
+            "/contact": "Contact our sales team at sales@acme.example or +49 30 1234",
+            "/contact-us": "/contact",
+            "/about-us": "/contact/",
+        })
+        with patch("scraper._HAS_CRAWL4AI", False):
+            result = await pool.crawl_contact_pages("acme.example")
+        await pool._httpx_client.aclose()
+
+        assert result.count("sales@acme.example") == 1
+
+
+class TestDoCrawl:
+    @pytest.mark.asyncio
+    async def test_copies_prebuilt_run_configs(self):
+        import scraper
+        if not scraper._load_crawl4ai():
+            pytest.skip("crawl4ai not installed")
+
+        crawler = MagicMock()
+        crawler.arun = AsyncMock(return_value=MagicMock(
+            success=True, markdown="Hello", screenshot=None, metadata={"title": "T"},
+        ))
+        await scraper._do_crawl("https://a.example", True, crawler)
+        await scraper._do_crawl("https://b.example", True, crawler)
+        await scraper._do_crawl("https://c.example", False, crawler)
+
+        configs = [call.kwargs["config"] for call in crawler.arun.await_args_list]
+        # Each crawl gets its own copy of the prebuilt template (arun writes config.url)
+        assert len({id(c) for c in configs}) == 3
+        assert not any(c is t for c in configs for t in scraper._RUN_CONFIGS.values())
+        assert configs[0].screenshot and not configs[2].screenshot
+        configs[0].url = "https://a.example"
+        assert getattr(scraper._RUN_CONFIGS[True], "url", None) != "https://a.example"
+
+
+# ═══════════════════════════════════════════════
+# _do_crawl_httpx
+# ═══════════════════════════════════════════════
+
+class TestDoCrawlHttpx:
+    @pytest.mark.asyncio
+    async def test_caps_download_size(self):
+        import httpx
+        import scraper
+
+        body = b"<p>" + b"a" * (scraper._MAX_HTML_BYTES * 3) + b"</p>"
+
+        async def stream_body():
+            for i in range(0, len(body), 65536):
+                yield body[i:i + 65536]
+
+        def handler(request):
+            return httpx.Response(200, content=stream_body(), headers={"content-type": "text/html"})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with patch.object(scraper, "truncate_to_tokens", side_effect=lambda text, _: text):
+                result = await scraper._do_crawl_httpx("https://example.com", client)
+
+        assert result.success
+        assert len(result.markdown_content) < scraper._MAX_HTML_BYTES + 65536
+
+    @pytest.mark.asyncio
+    async def test_title_and_charset_handling(self):
+        import httpx
+        import scraper
+
+        pages = {
+            "/utf8": ("utf-8", "<title>Café &amp; Co</title><p>Grüße</p>"),
+            "/latin": ("iso-8859-1", "<title>Café &amp; Co</title><p>Grüße</p>"),
+        }
+
+        def handler(request):
+            charset, html = pages[request.url.path]
+            return httpx.Response(
+                200, content=html.encode(charset),
+                headers={"content-type": f"text/html; charset={charset}"},
+            )
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for path in pages:
+                result = await scraper._do_crawl_httpx(f"https://example.com{path}", client)
+                assert result.title == "Café & Co"
+                assert "Grüße" in result.markdown_content
+
+    @pytest.mark.asyncio
+    async def test_skips_non_html_body(self):
+        import httpx
+        import scraper
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, content=b"%PDF-1.7", headers={"content-type": "application/pdf"})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            result = await scraper._do_crawl_httpx("https://example.com/brochure", client)
+
+        assert not result.success
+        assert result.error_message == "Unsupported content type: application/pdf"
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_no_retry_on_404(self):
+        import httpx
+        import scraper
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with patch("scraper.asyncio.sleep", new=AsyncMock()) as sleep:
+                result = await scraper._do_crawl_httpx("https://example.com/missing", client)
+
+        assert not result.success
+        assert result.error_message == "HTTP 404"
+        assert len(calls) == 1
+        sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_honours_retry_after_on_429(self):
+        import httpx
+        import scraper
+
+        responses = [httpx.Response(429, headers={"Retry-After": "7"}), httpx.Response(200, html="<p>ok</p>")]
+
+        def handler(request):
+            return responses.pop(0)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with patch("scraper.asyncio.sleep", new=AsyncMock()) as sleep:
+                result = await scraper._do_crawl_httpx("https://example.com", client)
+
+        assert result.success
+        sleep.assert_awaited_once_with(7.0)
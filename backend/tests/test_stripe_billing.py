@@ -10,15 +10,21 @@ from unittest.mock import patch, AsyncMock, MagicMock
 from datetime import datetime, timezone
 
 import asyncio
+import hashlib
+import hmac
+import json
 import logging
 import os
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
 import stripe
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from db.models import Profile
+
 from stripe_billing import (
     is_stripe_configured,
     PLAN_PRICE_MAP,
@@ -31,14 +37,33 @@ from stripe_billing import (
     _handle_subscription_updated,
     _handle_subscription_deleted,
     _handle_payment_failed,
+    _sub_status_cache,
+    _seen_events,
+    _verify_signature,
+    _get_profile,
+    _period_values,
+    _first_price_id,
 )
 
 
-def _fake_to_thread(return_val):
-    """Create a coroutine function that ignores args and returns return_val."""
-    async def _coro(*args, **kwargs):
-        return return_val
-    return _coro
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    _sub_status_cache.clear()
+    _seen_events.clear()
+    yield
+    _sub_status_cache.clear()
+    _seen_events.clear()
+
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def _sign(payload: bytes, secret: str = WEBHOOK_SECRET, timestamp: Optional[int] = None) -> str:
+    """Build a Stripe-Signature header for payload."""
+    t = str(int(time.time()) if timestamp is None else timestamp)
+    sig = hmac.new(secret.encode(), t.encode() + b"." + payload, hashlib.sha256).hexdigest()
+    return f"t={t},v1={sig}"
+
 
 # ── helpers to build a fake Profile row ────────
 
@@ -59,6 +84,7 @@ def _mock_db_with_profile(profile):
     """Return a mock AsyncSession whose execute() returns the given profile."""
     result = MagicMock()
     result.scalar_one_or_none.return_value = profile
+    result.first.return_value = profile
 
     db = AsyncMock()
     db.execute = AsyncMock(return_value=result)
@@ -69,12 +95,59 @@ def _mock_db_with_profile(profile):
 def _mock_db_no_profile():
     result = MagicMock()
     result.scalar_one_or_none.return_value = None
+    result.first.return_value = None
     db = AsyncMock()
     db.execute = AsyncMock(return_value=result)
     db.commit = AsyncMock()
     return db
 
 
+TEST_USER_FREE = "00000000-0000-4000-8000-000000000001"
+TEST_USER_PRO = "00000000-0000-4000-8000-000000000002"
+
+
+async def _link_customer(db, user_id, customer_id="cus_abc", **fields):
+    """Attach a Stripe customer (and any extra billing fields) to a seeded profile."""
+    await db.execute(
+        update(Profile).where(Profile.id == user_id).values(stripe_customer_id=customer_id, **fields)
+    )
+    await db.commit()
+
+
+async def _load_profile(db, user_id) -> Profile:
+    """Re-read a profile, bypassing the session's identity map."""
+    return (await db.execute(
+        select(Profile).where(Profile.id == user_id).execution_options(populate_existing=True)
+    )).scalar_one()
+
+
+def _item(price_id="price_pro", start=1700000000, end=1703000000) -> dict:
+    """A subscription item as the pinned API version sends it — the period lives here."""
+    return {"id": "si_1", "price": {"id": price_id}, "current_period_start": start, "current_period_end": end}
+
+
+def _subscription(sub_id="sub_123", price_id="price_pro", status="active") -> stripe.Subscription:
+    """An SDK Subscription object (not a dict) in the pinned API version's shape."""
+    return stripe.Subscription.construct_from(
+        {"id": sub_id, "object": "subscription", "status": status, "items": {"object": "list", "data": [_item(price_id)]}},
+        "sk_test",
+    )
+
+
+def _retrieve_with_period():
+    """Subscription.retrieve_async stand-in returning a subscription with period dates."""
+    return AsyncMock(return_value=_subscription())
+
+
+async def _billing_columns(db) -> list[tuple]:
+    """(id, plan, plan_tier, stripe_subscription_id) for every profile, freshly read."""
+    return (await db.execute(
+        select(Profile.id, Profile.plan, Profile.plan_tier, Profile.stripe_subscription_id)
+        .order_by(Profile.id)
+        .execution_options(populate_existing=True)
+    )).all()
+
+
 # ═══════════════════════════════════════════════
 # Configuration helpers
 # ═══════════════════════════════════════════════
@@ -106,6 +179,51 @@ class TestStripeConfig:
                 assert PRICE_PLAN_MAP.get(price_id) == plan
 
 
+class TestPeriodValues:
+    def test_reads_first_item(self):
+        assert _period_values({"items": {"data": [_item()]}}) == {
+            "plan_period_start": datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc),
+            "plan_period_end": datetime(2023, 12, 19, 15, 33, 20, tzinfo=timezone.utc),
+        }
+
+    def test_top_level_fallback(self):
+        # Older API versions carried the period on the subscription itself
+        sub = {"items": {"data": [{"price": {"id": "price_pro"}}]}, "current_period_end": 1703000000}
+        assert _period_values(sub) == {"plan_period_end": datetime(2023, 12, 19, 15, 33, 20, tzinfo=timezone.utc)}
+
+    def test_item_wins_over_top_level(self):
+        sub = {"items": {"data": [_item(end=1706000000)]}, "current_period_end": 1703000000}
+        assert _period_values(sub)["plan_period_end"] == datetime.fromtimestamp(1706000000, tz=timezone.utc)
+
+    def test_missing_timestamps_are_left_out(self):
+        assert _period_values({"current_period_start": None}) == {}
+        assert _period_values({"items": {"data": [{"current_period_end": None}]}}) == {}
+
+
+class TestFirstPriceId:
+    def test_first_item_price(self):
+        sub = {"items": {"data": [{"price": {"id": "price_a"}}, {"price": {"id": "price_b"}}]}}
+        assert _first_price_id(sub) == "price_a"
+
+    def test_no_items(self):
+        assert _first_price_id({}) is None
+        assert _first_price_id({"items": {"data": []}}) is None
+
+    def test_item_without_price(self):
+        assert _first_price_id({"items": {"data": [{}]}}) == ""
+
+
+class TestGetProfile:
+    @pytest.mark.asyncio
+    async def test_loads_by_id(self, db_session):
+        profile = await _get_profile(db_session, TEST_USER_PRO)
+        assert profile.plan == "pro"
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_is_none(self, db_session):
+        assert await _get_profile(db_session, "missing") is None
+
+
 # ═══════════════════════════════════════════════
 # Checkout session
 # ═══════════════════════════════════════════════
@@ -126,11 +244,32 @@ class TestCheckoutSession:
         fake_session.url = "https://checkout.stripe.com/s/123"
 
         with patch("stripe_billing.PLAN_PRICE_MAP", {"pro": "price_pro"}), \
-             patch("stripe_billing.asyncio.to_thread", side_effect=_fake_to_thread(fake_session)):
+             patch("stripe_billing.stripe.checkout.Session.create_async", AsyncMock(return_value=fake_session)):
             url = await create_checkout_session(db, "user-1", "a@b.com", "pro")
 
         assert url == "https://checkout.stripe.com/s/123"
 
+    @pytest.mark.asyncio
+    async def test_new_customer_is_created_by_checkout(self):
+        profile = FakeProfile(stripe_customer_id=None)
+        db = _mock_db_with_profile(profile)
+
+        create_customer = AsyncMock()
+        create_session = AsyncMock(return_value=MagicMock(url="https://checkout.stripe.com/s/456"))
+
+        with patch("stripe_billing.PLAN_PRICE_MAP", {"pro": "price_pro"}), \
+             patch("stripe_billing.stripe.Customer.create_async", create_customer), \
+             patch("stripe_billing.stripe.checkout.Session.create_async", create_session):
+            url = await create_checkout_session(db, "user-1", "a@b.com", "pro")
+
+        assert url == "https://checkout.stripe.com/s/456"
+        create_customer.assert_not_awaited()
+        kwargs = create_session.await_args.kwargs
+        assert kwargs["customer_email"] == "a@b.com"
+        assert "customer" not in kwargs
+        assert kwargs["metadata"] == {"user_id": "user-1", "plan": "pro"}
+        db.commit.assert_not_awaited()
+
 
 # ═══════════════════════════════════════════════
 # Portal session
@@ -152,7 +291,7 @@ class TestPortalSession:
         fake_session = MagicMock()
         fake_session.url = "https://billing.stripe.com/portal/x"
 
-        with patch("stripe_billing.asyncio.to_thread", side_effect=_fake_to_thread(fake_session)):
+        with patch("stripe_billing.stripe.billing_portal.Session.create_async", AsyncMock(return_value=fake_session)):
             url = await create_portal_session(db, "user-1")
 
         assert url == "https://billing.stripe.com/portal/x"
@@ -192,13 +331,90 @@ class TestBillingStatus:
         fake_sub = MagicMock()
         fake_sub.status = "active"
 
-        with patch("stripe_billing.asyncio.to_thread", side_effect=_fake_to_thread(fake_sub)):
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", AsyncMock(return_value=fake_sub)):
             status = await get_billing_status(db, "user-1")
 
         assert status["plan"] == "pro"
         assert status["status"] == "active"
         assert status["has_subscription"] is True
 
+    @pytest.mark.asyncio
+    async def test_subscription_status_is_cached(self):
+        profile = FakeProfile(plan="pro", stripe_subscription_id="sub_123", stripe_customer_id="cus_abc")
+        db = _mock_db_with_profile(profile)
+
+        fake_sub = MagicMock()
+        fake_sub.status = "active"
+        retrieve = AsyncMock(return_value=fake_sub)
+
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve):
+            await get_billing_status(db, "user-1")
+            status = await get_billing_status(db, "user-1")
+
+        assert status["status"] == "active"
+        assert retrieve.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_subscription_webhook_evicts_cached_status(self):
+        profile = FakeProfile(plan="pro", stripe_subscription_id="sub_123", stripe_customer_id="cus_abc")
+        db = _mock_db_with_profile(profile)
+
+        active, past_due = MagicMock(status="active"), MagicMock(status="past_due")
+        retrieve = AsyncMock(side_effect=[active, past_due])
+
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve):
+            await get_billing_status(db, "user-1")
+            await _handle_subscription_updated(
+                {"customer": "cus_abc", "id": "sub_123", "status": "past_due"}, db,
+            )
+            status = await get_billing_status(db, "user-1")
+
+        assert status["status"] == "past_due"
+
+    @pytest.mark.asyncio
+    async def test_failed_retrieve_is_not_cached(self):
+        profile = FakeProfile(plan="pro", stripe_subscription_id="sub_123", stripe_customer_id="cus_abc")
+        db = _mock_db_with_profile(profile)
+
+        retrieve = AsyncMock(side_effect=[Exception("Stripe down"), MagicMock(status="active")])
+
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve):
+            assert (await get_billing_status(db, "user-1"))["status"] == "expired"
+            assert (await get_billing_status(db, "user-1"))["status"] == "active"
+
+    @pytest.mark.asyncio
+    async def test_reads_columns_from_db(self, db_session):
+        await _link_customer(
+            db_session, TEST_USER_PRO,
+            stripe_subscription_id="sub_123",
+            plan_period_end=datetime(2027, 1, 1, tzinfo=timezone.utc),
+        )
+
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", AsyncMock(return_value=MagicMock(status="active"))):
+            status = await get_billing_status(db_session, TEST_USER_PRO)
+
+        assert status["plan"] == "pro"
+        assert status["status"] == "active"
+        assert status["stripe_customer_id"] == "cus_abc"
+        assert status["period_end"].startswith("2027-01-01")
+
+    @pytest.mark.asyncio
+    async def test_syncs_missed_subscription(self, db_session):
+        await _link_customer(db_session, TEST_USER_FREE)
+
+        fake_sub = _subscription("sub_789", "price_ent")
+
+        with patch("stripe_billing.PRICE_PLAN_MAP", {"price_ent": "enterprise"}), \
+             patch("stripe_billing.stripe.Subscription.list_async", AsyncMock(return_value=MagicMock(data=[fake_sub]))):
+            status = await get_billing_status(db_session, TEST_USER_FREE)
+
+        assert status["plan"] == "enterprise"
+        assert status["has_subscription"] is True
+        assert status["period_end"] is not None
+
+        profile = await _load_profile(db_session, TEST_USER_FREE)
+        assert (profile.plan, profile.plan_tier, profile.stripe_subscription_id) == ("enterprise", "enterprise", "sub_789")
+
 
 # ═══════════════════════════════════════════════
 # Webhook: handle_webhook dispatch
@@ -208,13 +424,100 @@ class TestHandleWebhook:
     @pytest.mark.asyncio
     async def test_invalid_payload_raises(self):
         db = AsyncMock()
+        with patch("stripe_billing.STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET):
+            with pytest.raises(ValueError, match="Invalid payload"):
+                await handle_webhook(b"bad", _sign(b"bad"), db)
 
-        async def _raise_value_error(*a, **kw):
-            raise ValueError("Invalid payload")
+    @pytest.mark.asyncio
+    async def test_invalid_signature_raises(self):
+        db = AsyncMock()
+        with patch("stripe_billing.STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET):
+            with pytest.raises(ValueError, match="Invalid signature"):
+                await handle_webhook(b"{}", _sign(b"{}", secret="whsec_other"), db)
 
-        with patch("stripe_billing.asyncio.to_thread", side_effect=_raise_value_error):
-            with pytest.raises(ValueError, match="Invalid payload"):
-                await handle_webhook(b"bad", "sig", db)
+    @pytest.mark.asyncio
+    async def test_subscription_created_uses_update_handler(self):
+        db = AsyncMock()
+        payload = json.dumps(
+            {"type": "customer.subscription.created", "data": {"object": {"id": "sub_1"}}}
+        ).encode()
+
+        handler = AsyncMock()
+        with patch("stripe_billing.STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET), \
+             patch.dict("stripe_billing._WEBHOOK_HANDLERS", {"customer.subscription.created": handler}):
+            result = await handle_webhook(payload, _sign(payload), db)
+
+        handler.assert_awaited_once_with({"id": "sub_1"}, db)
+        assert result == {"event": "customer.subscription.created", "handled": True}
+
+    @pytest.mark.asyncio
+    async def test_redelivered_event_is_skipped(self):
+        db = AsyncMock()
+        payload = json.dumps(
+            {"id": "evt_1", "type": "invoice.payment_failed", "data": {"object": {"customer": "cus_abc"}}}
+        ).encode()
+
+        handler = AsyncMock()
+        with patch("stripe_billing.STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET), \
+             patch.dict("stripe_billing._WEBHOOK_HANDLERS", {"invoice.payment_failed": handler}):
+            await handle_webhook(payload, _sign(payload), db)
+            result = await handle_webhook(payload, _sign(payload), db)
+
+        handler.assert_awaited_once()
+        assert result["duplicate"] is True
+
+    @pytest.mark.asyncio
+    async def test_failed_event_is_retried(self):
+        db = AsyncMock()
+        payload = json.dumps(
+            {"id": "evt_2", "type": "invoice.payment_failed", "data": {"object": {}}}
+        ).encode()
+
+        handler = AsyncMock(side_effect=[RuntimeError("db down"), None])
+        with patch("stripe_billing.STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET), \
+             patch.dict("stripe_billing._WEBHOOK_HANDLERS", {"invoice.payment_failed": handler}):
+            with pytest.raises(RuntimeError):
+                await handle_webhook(payload, _sign(payload), db)
+            result = await handle_webhook(payload, _sign(payload), db)
+
+        assert handler.await_count == 2
+        assert "duplicate" not in result
+
+    def test_subscription_created_and_updated_share_a_handler(self):
+        from stripe_billing import _WEBHOOK_HANDLERS
+        assert _WEBHOOK_HANDLERS["customer.subscription.created"] is _handle_subscription_updated
+        assert _WEBHOOK_HANDLERS["customer.subscription.updated"] is _handle_subscription_updated
+
+    @pytest.mark.asyncio
+    async def test_unhandled_event_is_acknowledged(self):
+        db = AsyncMock()
+        payload = json.dumps({"type": "invoice.created", "data": {"object": {}}}).encode()
+        with patch("stripe_billing.STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET):
+            result = await handle_webhook(payload, _sign(payload), db)
+        assert result == {"event": "invoice.created", "handled": True}
+        db.execute.assert_not_awaited()
+
+
+class TestVerifySignature:
+    def test_valid_signature(self):
+        _verify_signature(b'{"id": 1}', _sign(b'{"id": 1}'), WEBHOOK_SECRET)
+
+    def test_any_v1_signature_may_match(self):
+        header = "v1=deadbeef," + _sign(b"{}") + ",v0=ignored"
+        _verify_signature(b"{}", header, WEBHOOK_SECRET)
+
+    def test_tampered_payload_rejected(self):
+        with pytest.raises(ValueError, match="Invalid signature"):
+            _verify_signature(b'{"id": 2}', _sign(b'{"id": 1}'), WEBHOOK_SECRET)
+
+    def test_stale_timestamp_rejected(self):
+        header = _sign(b"{}", timestamp=int(time.time()) - 3600)
+        with pytest.raises(ValueError, match="Invalid signature"):
+            _verify_signature(b"{}", header, WEBHOOK_SECRET)
+
+    def test_malformed_header_rejected(self):
+        with pytest.raises(ValueError, match="Invalid signature"):
+            _verify_signature(b"{}", "garbage", WEBHOOK_SECRET)
 
 
 # ═══════════════════════════════════════════════
@@ -223,74 +526,228 @@ class TestHandleWebhook:
 
 class TestCheckoutCompleted:
     @pytest.mark.asyncio
-    async def test_activates_plan(self):
-        profile = FakeProfile(plan="free")
-        db = _mock_db_with_profile(profile)
-
+    async def test_activates_plan(self, db_session):
         session_data = {
             "customer": "cus_abc",
             "subscription": "sub_123",
-            "metadata": {"user_id": "user-1", "plan": "pro"},
+            "metadata": {"user_id": TEST_USER_FREE, "plan": "pro"},
         }
 
-        fake_sub = MagicMock()
-        fake_sub.current_period_start = 1700000000
-        fake_sub.current_period_end = 1703000000
-
-        with patch("stripe_billing.asyncio.to_thread", side_effect=_fake_to_thread(fake_sub)):
-            await _handle_checkout_completed(session_data, db)
+        retrieve = _retrieve_with_period()
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve):
+            await _handle_checkout_completed(session_data, db_session)
 
+        profile = await _load_profile(db_session, TEST_USER_FREE)
         assert profile.plan == "pro"
+        assert profile.plan_tier == "pro"
         assert profile.stripe_customer_id == "cus_abc"
         assert profile.stripe_subscription_id == "sub_123"
-        db.commit.assert_awaited()
+        # subscription.created hasn't filled in the period yet — fetched once
+        retrieve.assert_awaited_once_with("sub_123")
+        assert profile.plan_period_end.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1703000000, tz=timezone.utc)
 
     @pytest.mark.asyncio
-    async def test_no_user_id_lookup_by_customer(self):
-        profile = FakeProfile(id="found-user")
-        db = _mock_db_with_profile(profile)
+    async def test_retrieve_failure_keeps_checkout_applied(self, db_session):
+        session_data = {
+            "customer": "cus_abc",
+            "subscription": "sub_123",
+            "metadata": {"user_id": TEST_USER_FREE, "plan": "pro"},
+        }
+
+        failing = AsyncMock(side_effect=stripe.APIConnectionError("timeout"))
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", failing):
+            await _handle_checkout_completed(session_data, db_session)  # no raise
+
+        profile = await _load_profile(db_session, TEST_USER_FREE)
+        assert profile.plan == "pro"
+        assert profile.plan_period_end is None
 
+    @pytest.mark.asyncio
+    async def test_existing_period_skips_retrieve(self, db_session):
+        await _link_customer(
+            db_session, TEST_USER_FREE, plan_period_end=datetime.fromtimestamp(1703000000, tz=timezone.utc),
+        )
         session_data = {
             "customer": "cus_abc",
             "subscription": "sub_123",
-            "metadata": {},
+            "metadata": {"user_id": TEST_USER_FREE, "plan": "pro"},
         }
 
-        fake_sub = MagicMock()
-        fake_sub.current_period_start = 1700000000
-        fake_sub.current_period_end = 1703000000
+        retrieve = AsyncMock()
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve):
+            await _handle_checkout_completed(session_data, db_session)
+
+        retrieve.assert_not_awaited()  # no Stripe round-trip once the period is known
+        assert (await _load_profile(db_session, TEST_USER_FREE)).plan == "pro"
+
+    @pytest.mark.asyncio
+    async def test_expanded_subscription_sets_period(self, db_session):
+        session_data = {
+            "customer": "cus_abc",
+            "subscription": {"id": "sub_123", "items": {"data": [_item()]}},
+            "metadata": {"user_id": TEST_USER_FREE, "plan": "pro"},
+        }
+
+        await _handle_checkout_completed(session_data, db_session)
+
+        profile = await _load_profile(db_session, TEST_USER_FREE)
+        assert profile.stripe_subscription_id == "sub_123"
+        # SQLite drops tzinfo; compare the wall-clock UTC value
+        assert profile.plan_period_start.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1700000000, tz=timezone.utc)
+        assert profile.plan_period_end.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1703000000, tz=timezone.utc)
 
-        with patch("stripe_billing.asyncio.to_thread", side_effect=_fake_to_thread(fake_sub)):
-            await _handle_checkout_completed(session_data, db)
+    @pytest.mark.asyncio
+    async def test_no_user_id_lookup_by_customer(self, db_session):
+        await _link_customer(db_session, TEST_USER_FREE)
+
+        session_data = {
+            "customer": "cus_abc",
+            "subscription": "sub_123",
+            "metadata": {},
+        }
 
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", _retrieve_with_period()):
+            await _handle_checkout_completed(session_data, db_session)
+
+        profile = await _load_profile(db_session, TEST_USER_FREE)
         assert profile.plan == "pro"
 
+    @pytest.mark.asyncio
+    async def test_redelivery_writes_nothing(self, db_session):
+        session_data = {
+            "customer": "cus_abc",
+            "subscription": "sub_123",
+            "metadata": {"user_id": TEST_USER_FREE, "plan": "pro"},
+        }
+
+        retrieve = _retrieve_with_period()
+        with patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve), \
+             patch.object(db_session, "commit", wraps=db_session.commit) as commit:
+            await _handle_checkout_completed(session_data, db_session)
+            await _handle_checkout_completed(session_data, db_session)
+
+        assert commit.await_count == 2  # plan, then the fetched period — once
+        retrieve.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_is_noop(self, db_session):
+        session_data = {"customer": "cus_new", "subscription": "sub_1", "metadata": {"user_id": "missing"}}
+        await _handle_checkout_completed(session_data, db_session)
+
+        profiles = (await db_session.execute(
+            select(Profile.stripe_customer_id).execution_options(populate_existing=True)
+        )).scalars().all()
+        assert "cus_new" not in profiles
+
 
 class TestSubscriptionUpdated:
     @pytest.mark.asyncio
-    async def test_updates_plan_from_price_id(self):
-        profile = FakeProfile(plan="pro")
-        db = _mock_db_with_profile(profile)
+    async def test_updates_plan_from_price_id(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO)
 
         sub_data = {
             "customer": "cus_abc",
             "id": "sub_456",
             "status": "active",
-            "items": {"data": [{"price": {"id": "price_ent"}}]},
-            "current_period_start": 1700000000,
-            "current_period_end": 1703000000,
+            "items": {"data": [_item("price_ent")]},
         }
 
         with patch("stripe_billing.PRICE_PLAN_MAP", {"price_ent": "enterprise"}):
-            await _handle_subscription_updated(sub_data, db)
+            await _handle_subscription_updated(sub_data, db_session)
 
+        profile = await _load_profile(db_session, TEST_USER_PRO)
         assert profile.plan == "enterprise"
-        db.commit.assert_awaited()
+        assert profile.plan_tier == "enterprise"
+        assert profile.stripe_subscription_id == "sub_456"
+        assert profile.plan_period_end is not None
 
     @pytest.mark.asyncio
-    async def test_canceled_status_downgrades(self):
-        profile = FakeProfile(plan="pro")
-        db = _mock_db_with_profile(profile)
+    async def test_redelivery_writes_nothing(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO)
+        sub_data = {
+            "customer": "cus_abc",
+            "id": "sub_456",
+            "status": "active",
+            "items": {"data": [_item("price_ent")]},
+        }
+
+        with patch("stripe_billing.PRICE_PLAN_MAP", {"price_ent": "enterprise"}), \
+             patch.object(db_session, "commit", wraps=db_session.commit) as commit:
+            await _handle_subscription_updated(sub_data, db_session)
+            await _handle_subscription_updated(sub_data, db_session)
+            assert commit.await_count == 1
+
+            renewed = {**sub_data, "items": {"data": [_item("price_ent", end=1706000000)]}}
+            await _handle_subscription_updated(renewed, db_session)
+            assert commit.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_price_keeps_plan(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO, plan_tier="free")
+
+        sub_data = {
+            "customer": "cus_abc",
+            "id": "sub_456",
+            "status": "active",
+            "items": {"data": [{"price": {"id": "price_legacy"}}]},
+        }
+
+        await _handle_subscription_updated(sub_data, db_session)
+
+        profile = await _load_profile(db_session, TEST_USER_PRO)
+        assert profile.plan == "pro"
+        assert profile.plan_tier == "pro"  # re-synced from plan
+
+    @pytest.mark.asyncio
+    async def test_created_before_checkout_links_customer_by_metadata(self, db_session):
+        # First-time subscriber: Checkout created the customer, and Stripe delivers
+        # subscription.created before checkout.session.completed.
+        sub_data = {
+            "customer": "cus_new",
+            "id": "sub_789",
+            "status": "active",
+            "metadata": {"user_id": TEST_USER_FREE},
+            "items": {"data": [_item("price_pro")]},
+        }
+        session_data = {
+            "customer": "cus_new",
+            "subscription": "sub_789",
+            "metadata": {"user_id": TEST_USER_FREE, "plan": "pro"},
+        }
+
+        retrieve = AsyncMock()
+        with patch("stripe_billing.PRICE_PLAN_MAP", {"price_pro": "pro"}), \
+             patch("stripe_billing.stripe.Subscription.retrieve_async", retrieve):
+            await _handle_subscription_updated(sub_data, db_session)
+            await _handle_checkout_completed(session_data, db_session)
+
+        retrieve.assert_not_awaited()
+
+        profile = await _load_profile(db_session, TEST_USER_FREE)
+        assert profile.stripe_customer_id == "cus_new"
+        assert profile.stripe_subscription_id == "sub_789"
+        assert profile.plan == "pro"
+        assert profile.plan_period_end.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1703000000, tz=timezone.utc)
+
+    @pytest.mark.asyncio
+    async def test_metadata_does_not_relink_existing_customer(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO, customer_id="cus_old")
+        sub_data = {
+            "customer": "cus_other",
+            "id": "sub_789",
+            "status": "canceled",
+            "metadata": {"user_id": TEST_USER_PRO},
+        }
+
+        await _handle_subscription_updated(sub_data, db_session)
+
+        profile = await _load_profile(db_session, TEST_USER_PRO)
+        assert profile.stripe_customer_id == "cus_old"
+        assert profile.plan == "pro"
+
+    @pytest.mark.asyncio
+    async def test_canceled_status_downgrades(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO)
 
         sub_data = {
             "customer": "cus_abc",
@@ -299,42 +756,74 @@ class TestSubscriptionUpdated:
             "items": {"data": []},
         }
 
-        await _handle_subscription_updated(sub_data, db)
+        await _handle_subscription_updated(sub_data, db_session)
+
+        profile = await _load_profile(db_session, TEST_USER_PRO)
         assert profile.plan == "free"
 
 
 class TestSubscriptionDeleted:
     @pytest.mark.asyncio
-    async def test_downgrades_to_free(self):
-        profile = FakeProfile(
-            plan="pro",
-            stripe_subscription_id="sub_123",
-        )
-        db = _mock_db_with_profile(profile)
+    async def test_downgrades_to_free(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO, stripe_subscription_id="sub_123")
 
-        await _handle_subscription_deleted({"customer": "cus_abc"}, db)
+        await _handle_subscription_deleted({"customer": "cus_abc"}, db_session)
 
+        profile = await _load_profile(db_session, TEST_USER_PRO)
         assert profile.plan == "free"
         assert profile.plan_tier == "free"
         assert profile.stripe_subscription_id is None
-        db.commit.assert_awaited()
 
     @pytest.mark.asyncio
-    async def test_no_profile_is_noop(self):
-        db = _mock_db_no_profile()
+    async def test_no_profile_is_noop(self, db_session):
         # Should not raise
-        await _handle_subscription_deleted({"customer": "cus_unknown"}, db)
+        await _handle_subscription_deleted({"customer": "cus_unknown"}, db_session)
+
+    @pytest.mark.asyncio
+    async def test_redelivery_writes_nothing(self, db_session):
+        await _link_customer(db_session, TEST_USER_PRO, stripe_subscription_id="sub_123")
+
+        with patch.object(db_session, "commit", wraps=db_session.commit) as commit:
+            await _handle_subscription_deleted({"customer": "cus_abc"}, db_session)
+            await _handle_subscription_deleted({"customer": "cus_abc"}, db_session)
+
+        assert commit.await_count == 1
 
 
 class TestPaymentFailed:
     @pytest.mark.asyncio
-    async def test_logs_warning(self):
-        profile = FakeProfile()
-        db = _mock_db_with_profile(profile)
-        # Should not raise, just logs
-        await _handle_payment_failed({"customer": "cus_abc", "attempt_count": 2}, db)
+    async def test_logs_warning(self, db_session, caplog):
+        await _link_customer(db_session, TEST_USER_PRO)
+        with caplog.at_level(logging.WARNING, logger="stripe_billing"):
+            await _handle_payment_failed({"customer": "cus_abc", "attempt_count": 2}, db_session)
+        assert TEST_USER_PRO in caplog.text
 
     @pytest.mark.asyncio
-    async def test_unknown_customer_no_crash(self):
+    async def test_unknown_customer_no_crash(self, db_session):
+        await _handle_payment_failed({"customer": "cus_unknown", "attempt_count": 2}, db_session)
+
+    @pytest.mark.asyncio
+    async def test_first_attempt_skips_lookup(self, caplog):
         db = _mock_db_no_profile()
-        await _handle_payment_failed({"customer": "cus_unknown", "attempt_count": 1}, db)
+        with caplog.at_level(logging.WARNING, logger="stripe_billing"):
+            await _handle_payment_failed({"customer": "cus_abc", "attempt_count": 1}, db)
+        db.execute.assert_not_awaited()
+        assert "cus_abc" in caplog.text
+
+
+class TestMissingMatchKey:
+    """A payload without a customer ID must not match every profile that has none."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("handler, payload", [
+        (_handle_checkout_completed, {"subscription": "sub_1", "metadata": {"plan": "enterprise"}}),
+        (_handle_subscription_updated, {"id": "sub_1", "status": "canceled", "items": {"data": []}}),
+        (_handle_subscription_deleted, {"id": "sub_1"}),
+    ])
+    async def test_profiles_left_unchanged(self, db_session, handler, payload):
+        before = await _billing_columns(db_session)
+
+        await handler(payload, db_session)
+
+        assert await _billing_columns(db_session) == before
+
@@ -0,0 +1,151 @@
+"""
+Tests for support_chat_engine.py
+
+Covers the local hash embedding, vectorized chunk retrieval and the
+cached chunk index, and question/answer sanitization.
+"""
+
+import hashlib
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import update
+
+from db.models import KnowledgeChunk, KnowledgeDocument
+from support_chat_engine import SupportChatEngine, _hash_embedding, _sanitize_question
+
+
+@pytest.fixture
+def engine():
+    eng = SupportChatEngine()
+    eng.kimi_client = None  # local hash embeddings only
+    return eng
+
+
+async def _add_doc(db, title, chunks, status="active", embed=_hash_embedding) -> KnowledgeDocument:
+    doc = KnowledgeDocument(
+        id=str(uuid.uuid4()), slug=title.lower().replace(" ", "-"), title=title,
+        source_path=f"docs/{title}.md", content_hash="x" * 64, status=status,
+    )
+    db.add(doc)
+    for idx, content in enumerate(chunks):
+        emb = embed(content)
+        db.add(KnowledgeChunk(
+            id=str(uuid.uuid4()), document_id=doc.id, chunk_index=idx, content=content,
+            embedding=emb.tolist() if emb is not None else None,
+        ))
+    await db.commit()
+    return doc
+
+
+# ═══════════════════════════════════════════════
+# _hash_embedding
+# ═══════════════════════════════════════════════
+
+class TestHashEmbedding:
+    def test_unit_length(self):
+        vec = _hash_embedding("pipeline scoring for qualified leads")
+        assert vec.dtype == np.float32
+        assert vec.shape == (256,)
+        assert np.linalg.norm(vec) == pytest.approx(1.0)
+
+    def test_no_tokens_is_zero(self):
+        assert not _hash_embedding("! ?").any()
+
+    def test_deterministic(self):
+        assert np.array_equal(_hash_embedding("Lead export"), _hash_embedding("lead export"))
+
+    def test_buckets_match_stored_embeddings(self):
+        # Chunks indexed earlier were bucketed with int(md5(tok).hexdigest(), 16) % dim
+        text = "export export qualified leads"
+        expected = np.zeros(256, dtype=np.float32)
+        for tok in ("export", "export", "qualified", "leads"):
+            expected[int(hashlib.md5(tok.encode("utf-8")).hexdigest(), 16) % 256] += 1.0
+        expected /= np.linalg.norm(expected)
+        assert np.allclose(_hash_embedding(text), expected)
+
+
+# ═══════════════════════════════════════════════
+# _retrieve
+# ═══════════════════════════════════════════════
+
+class TestRetrieve:
+    async def test_ranks_matching_chunk_first(self, db_session, engine):
+        await _add_doc(db_session, "Export", ["Export qualified leads to CSV or Excel files."])
+        await _add_doc(db_session, "Scoring", ["Every lead gets a score from one to one hundred."])
+
+        hits = await engine._retrieve(db_session, "How do I export leads to CSV?")
+
+        assert hits[0].title == "Export"
+
+    async def test_skips_archived_and_unmatched_embeddings(self, db_session, engine):
+        await _add_doc(db_session, "Old", ["Export leads to CSV."], status="archived")
+        await _add_doc(db_session, "Other dim", ["Export leads to CSV."], embed=lambda t: np.ones(8, dtype=np.float32))
+        await _add_doc(db_session, "Missing", ["Export leads to CSV."], embed=lambda t: None)
+
+        hits = await engine._retrieve(db_session, "export leads csv")
+
+        # Keyword overlap still counts for chunks without a comparable embedding
+        assert sorted(h.title for h in hits) == ["Missing", "Other dim"]
+        assert all(h.score == pytest.approx(0.18) for h in hits)
+
+    async def test_top_k(self, db_session, engine):
+        await _add_doc(db_session, "Export", [f"Export leads batch {i}" for i in range(5)])
+        hits = await engine._retrieve(db_session, "export leads", top_k=2)
+        assert len(hits) == 2
+        assert hits[0].score >= hits[1].score
+
+    async def test_below_threshold_dropped(self, db_session, engine):
+        await _add_doc(db_session, "Scoring", ["Every lead gets a score."])
+        assert await engine._retrieve(db_session, "invoice refunds") == []
+
+
+# ═══════════════════════════════════════════════
+# _load_chunk_index
+# ═══════════════════════════════════════════════
+
+class TestChunkIndexCache:
+    async def test_reused_while_docs_unchanged(self, db_session, engine):
+        await _add_doc(db_session, "Export", ["Export leads to CSV."])
+        first = await engine._load_chunk_index(db_session)
+        assert await engine._load_chunk_index(db_session) is first
+
+    async def test_rebuilt_when_active_docs_change(self, db_session, engine):
+        doc = await _add_doc(db_session, "Export", ["Export leads to CSV."])
+        first = await engine._load_chunk_index(db_session)
+
+        await db_session.execute(
+            update(KnowledgeDocument).where(KnowledgeDocument.id == doc.id).values(content_hash="y" * 64)
+        )
+        await db_session.commit()
+        assert await engine._load_chunk_index(db_session) is not first
+
+        await db_session.execute(
+            update(KnowledgeDocument).where(KnowledgeDocument.id == doc.id).values(status="archived")
+        )
+        await db_session.commit()
+        assert (await engine._load_chunk_index(db_session)).chunk_ids == []
+
+
+# ═══════════════════════════════════════════════
+# Sanitization
+# ═══════════════════════════════════════════════
+
+class TestSanitization:
+    def test_question_strips_control_chars_and_tags(self):
+        assert _sanitize_question("  How <b>do</b> I\x00 export?  ") == "How do I export?"
+
+    def test_answer_drops_restricted_sentences(self):
+        answer = "Hunt scores every lead.  It runs on OpenAI models. Pricing starts at $49.\nExport to CSV."
+        assert SupportChatEngine._sanitize_customer_answer(answer, "What does Hunt do?") == (
+            "Hunt scores every lead. Export to CSV."
+        )
+
+    def test_technical_question_keeps_answer(self):
+        answer = "The API uses OpenAI embeddings."
+        assert SupportChatEngine._sanitize_customer_answer(answer, "Which embedding API?") == answer
+
+    def test_all_restricted_falls_back_to_pitch(self):
+        answer = SupportChatEngine._sanitize_customer_answer("Built with FastAPI.", "How is it built?")
+        assert answer.startswith("Hunt is built to deliver qualified B2B pipeline")
@@ -46,5 +46,14 @@ CREATE TABLE IF NOT EXISTS pipeline_schedules (
 );
 
 CREATE INDEX IF NOT EXISTS ix_pipeline_schedules_user_id ON pipeline_schedules(user_id);
-CREATE INDEX IF NOT EXISTS ix_schedules_next_run_active ON pipeline_schedules(next_run_at)
+DROP INDEX IF EXISTS ix_schedules_next_run_active;
+CREATE INDEX ix_schedules_next_run_active ON pipeline_schedules(next_run_at)
+    INCLUDE (id, user_id, name, frequency)
     WHERE is_active = TRUE AND is_running = FALSE;
+
+-- 5. Create scheduler_state table (cluster-wide daily re-qual guard)
+CREATE TABLE IF NOT EXISTS scheduler_state (
+    key VARCHAR(100) PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);